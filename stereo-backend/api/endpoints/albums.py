@@ -1,20 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
 import uuid
-from datetime import date
+from datetime import date, datetime, timezone
 from pydantic import BaseModel
 import requests
-from sqlalchemy import func
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from contextvars import copy_context
+from concurrent.futures import TimeoutError as FuturesTimeout
 
 from database.database import get_db
-from database.models import Album, Rating, Review
+from database.models import Album, AlbumStats, Review
+from database.text_search import album_matches, album_relevance
 from .reviews import ReviewResponse
+import musicbrainz
+from musicbrainz import PLACEHOLDER_COVER_URL, budget, get_cover_art_url
+from musicbrainz.enrichment import get_release_details
+from autocomplete import suggestion_index
+from covers import PENDING, cover_resolver
 
 router = APIRouter(prefix="/albums", tags=["albums"])
 # handles album endpoints with proper routing and api docs grouping
 
+# one deadline shared by all cover lookups of a search, anything slower gets the placeholder
+COVER_ART_DEADLINE = 5
+# bounded pool shared by all requests so a burst of searches can't spawn unbounded threads
+cover_art_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="cover-art")
+
 class AlbumCreate(BaseModel):  # what client sends
     title: str
     artist: str
@@ -30,7 +44,9 @@ class AlbumResponse(BaseModel):  # what client receives
     description: str | None = None
     runtime_minutes: int | None = None
     musicbrainz_id: str | None = None
+    cover_status: str = "resolved"  # pending until the background resolver has looked the cover up
     average_rating: float | None = None
+    rating_count: int = 0
 
     class Config:
         from_attributes = True 
@@ -49,6 +65,14 @@ class TrendingAlbumResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CoverStatusResponse(BaseModel):  # answer to cover polling
+    id: UUID
+    cover_url: str
+    cover_status: str
+
+    class Config:
+        from_attributes = True
+
 class AlbumSearchResult(BaseModel):
     mbid: str | None = None  # musicbrainz id if from api
     title: str
@@ -57,82 +81,101 @@ class AlbumSearchResult(BaseModel):
     cover_url: str | None = None
     in_database: bool  # true if already in database
 
+def hydrate_albums(db: Session, albums) -> List[AlbumResponse]:
+    # builds album responses with average rating and rating count from one album_stats lookup
+    album_ids = [album.id for album in albums]
+    stats = {}
+    if album_ids:
+        rows = db.query(AlbumStats).filter(AlbumStats.album_id.in_(album_ids)).all()
+        stats = {row.album_id: row for row in rows}
+
+    results = []
+    for album in albums:
+        response = AlbumResponse.model_validate(album)
+        album_stats = stats.get(album.id)
+        if album_stats and album_stats.rating_count:
+            response.average_rating = round(album_stats.rating_sum / album_stats.rating_count, 1)
+            response.rating_count = album_stats.rating_count
+        results.append(response)
+    return results
+
 def search_musicbrainz_api(query: str, limit: int = 10):
-    # searches musicbrainz api and returns album data
-    url = "https://musicbrainz.org/ws/2/release"
-    params = {
-        "query": query,
-        "fmt": "json",
-        "limit": limit
-    }
-    headers = {
-        "User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"
-    }
-    
+    # searches musicbrainz api (through the response cache) and returns album data
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        results = []
-        for release in data.get('releases', []):
-            # get cover art with proper fallback
-            cover_url = get_cover_art_url(release['id'])
-            
-            result = AlbumSearchResult(
-                mbid=release['id'],
-                title=release['title'],
-                artist=release['artist-credit'][0]['artist']['name'] if release.get('artist-credit') else "Unknown Artist",
-                release_date=release.get('date', 'Unknown'),
-                cover_url=cover_url,
-                in_database=False
-            )
-            results.append(result)
-        
-        return results
+        releases = musicbrainz.search_releases(query, limit=limit)
+        # look up all covers at once instead of one release at a time
+        cover_urls = get_cover_art_urls([release['id'] for release in releases])
+        return [release_to_search_result(release, cover_urls[release['id']]) for release in releases]
     except requests.RequestException as e:
         print(f"MusicBrainz API error: {e}")
         return []
 
-def get_cover_art_url(mbid: str) -> str:
-    # gets cover art from cover art archive
+def release_artist(release: dict) -> str:
+    return release['artist-credit'][0]['artist']['name'] if release.get('artist-credit') else "Unknown Artist"
+
+def release_to_search_result(release: dict, cover_url: str) -> AlbumSearchResult:
+    return AlbumSearchResult(
+        mbid=release['id'],
+        title=release['title'],
+        artist=release_artist(release),
+        release_date=release.get('date', 'Unknown'),
+        cover_url=cover_url,
+        in_database=False
+    )
+
+def iter_musicbrainz_results(query: str, limit: int, skip: set, deadline: float = COVER_ART_DEADLINE):
+    # yields musicbrainz results one by one as their covers resolve, fastest cover first
     try:
-        response = requests.get(
-            f"https://coverartarchive.org/release/{mbid}",
-            headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-            timeout=5
-        )
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('images'):
-                for image in data['images']:
-                    if image.get('front', False):
-                        return image['image']
-                return data['images'][0]['image']
-    except Exception:
+        releases = musicbrainz.search_releases(query, limit=limit)
+    except requests.RequestException as e:
+        print(f"MusicBrainz API error: {e}")
+        return
+    releases = [
+        release for release in releases
+        if (release['title'].lower(), release_artist(release).lower()) not in skip
+    ]
+    futures = {submit_cover_lookup(release['id']): release for release in releases}
+    remaining = dict(futures)
+    try:
+        for future in as_completed(futures, timeout=within_budget(deadline)):
+            yield release_to_search_result(remaining.pop(future), future.result())
+    except FuturesTimeout:
         pass
-    return "https://via.placeholder.com/500x500?text=No+Cover+Art"
+    # covers still running at the deadline get the placeholder, same as /albums/search
+    for release in remaining.values():
+        yield release_to_search_result(release, PLACEHOLDER_COVER_URL)
 
-@router.get("/search", response_model=List[AlbumSearchResult])
-def search_albums(q: str, db: Session = Depends(get_db)):
-    """
-    Search for albums in local database and MusicBrainz
-    """
+def submit_cover_lookup(mbid: str):
+    # the lookup runs in this request's context so it keeps to the request's latency budget
+    return cover_art_pool.submit(copy_context().run, get_cover_art_url, mbid)
+
+def within_budget(deadline: float) -> float:
+    left = budget.remaining()
+    return deadline if left is None else max(0, min(deadline, left))
+
+def get_cover_art_urls(mbids: List[str], deadline: float = COVER_ART_DEADLINE) -> dict:
+    # resolves covers concurrently; lookups still running at the deadline fall back to the placeholder.
+    # they keep running only until the request's latency budget runs out, so a slow one is usually
+    # cut off rather than cached; added albums get their cover from the background resolver instead
+    futures = {submit_cover_lookup(mbid): mbid for mbid in mbids}
+    done, pending = wait(futures, timeout=within_budget(deadline))
+    return {
+        mbid: future.result() if future in done else PLACEHOLDER_COVER_URL
+        for future, mbid in futures.items()
+    }
+
+def search_local_albums(db: Session, q: str) -> List[Album]:
     if not q or len(q.strip()) < 2:
         raise HTTPException(status_code=400, detail="Search query must be at least 2 characters")
     
     search_term = q.strip().lower()
-    
-    # 1. Search local database first
-    local_albums = db.query(Album).filter(
-        (Album.title.ilike(f"%{search_term}%")) | 
-        (Album.artist.ilike(f"%{search_term}%"))
+    return db.query(Album).filter(album_matches(search_term)).order_by(
+        album_relevance(search_term).desc()
     ).limit(10).all()
-    
-    # Convert local results to search results
-    local_results = []
-    for album in local_albums:
-        result = AlbumSearchResult(
+
+def local_search_results(local_albums: List[Album]) -> List[AlbumSearchResult]:
+    return [
+        AlbumSearchResult(
             mbid=getattr(album, 'musicbrainz_id', None),
             title=str(album.title),
             artist=str(album.artist),
@@ -140,7 +183,17 @@ def search_albums(q: str, db: Session = Depends(get_db)):
             cover_url=str(album.cover_url),
             in_database=True
         )
-        local_results.append(result)
+        for album in local_albums
+    ]
+
+@router.get("/search", response_model=List[AlbumSearchResult])
+def search_albums(q: str, db: Session = Depends(get_db)):
+    """
+    Search for albums in local database and MusicBrainz
+    """
+    # 1. Search local database first
+    local_albums = search_local_albums(db, q)
+    local_results = local_search_results(local_albums)
     
     # 2. If we have fewer than 10 results, search MusicBrainz
     if len(local_results) < 10:
@@ -157,13 +210,42 @@ def search_albums(q: str, db: Session = Depends(get_db)):
     
     return local_results
 
+@router.get("/search/stream")
+def stream_search_albums(q: str, db: Session = Depends(get_db)):
+    """
+    Same results as /albums/search, streamed as NDJSON (one AlbumSearchResult per line).
+    Local matches are sent right away, MusicBrainz results follow as their covers resolve.
+    """
+    # local results are built before streaming starts, the db session is released once the endpoint returns
+    local_albums = search_local_albums(db, q)
+    local_results = local_search_results(local_albums)
+    local_titles = {(album.title.lower(), album.artist.lower()) for album in local_albums}
+
+    def lines():
+        for result in local_results:
+            yield result.model_dump_json() + "\n"
+        if len(local_results) < 10:
+            for result in iter_musicbrainz_results(q, 10 - len(local_results), local_titles):
+                yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/covers", response_model=List[CoverStatusResponse])
+def get_album_covers(ids: List[UUID] = Query(...), db: Session = Depends(get_db)):
+    """
+    Current cover of each requested album, for polling albums whose cover is still pending
+    """
+    if len(ids) > 100:
+        raise HTTPException(status_code=400, detail="At most 100 album ids per request")
+    return db.query(Album.id, Album.cover_url, Album.cover_status).filter(Album.id.in_(ids)).all()
+
 @router.get("/{album_id}", response_model=AlbumResponse)
 def get_album(album_id: UUID, db: Session = Depends(get_db)):
     # retrieves specific album by its id
     album = db.query(Album).filter(Album.id == album_id).first()
     if album is None:
         raise HTTPException(status_code=404, detail="Album not found")
-    return album
+    return hydrate_albums(db, [album])[0]
 
 @router.post("/", response_model=AlbumResponse)
 def create_album(album: AlbumCreate, db: Session = Depends(get_db)):
@@ -179,6 +261,7 @@ def create_album(album: AlbumCreate, db: Session = Depends(get_db)):
     db.add(new_album)
     db.commit()
     db.refresh(new_album)
+    suggestion_index.add_album(new_album)
 
     return new_album
 
@@ -204,13 +287,16 @@ def get_album_average_rating(album_id: UUID, db: Session = Depends(get_db)):
     Retrieve the average rating for a specific album
     """
     
-    # the album exists?
-    album = db.query(Album).filter(Album.id == album_id).first()
-    if album is None:
+    # checks the album exists and reads its aggregates in one primary key lookup
+    row = db.query(Album.id, AlbumStats.rating_count, AlbumStats.rating_sum).outerjoin(
+        AlbumStats, Album.id == AlbumStats.album_id
+    ).filter(Album.id == album_id).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Album not found")
     
-    avg_rating = db.query(func.avg(Rating.rating)).filter(Rating.album_id == album_id).scalar()
-    return {"average_rating": avg_rating or 0}  # 0 if no ratings exist
+    _, rating_count, rating_sum = row
+    avg_rating = rating_sum / rating_count if rating_count else 0
+    return {"average_rating": avg_rating}  # 0 if no ratings exist
 
 
 def parse_release_date(date_str: str) -> date:
@@ -250,18 +336,24 @@ def add_album_from_search(album_data: AlbumSearchResult, db: Session = Depends(g
     # parse release date with better handling
     release_date = parse_release_date(album_data.release_date)
     
-    # create new album
+    # create new album, a cover the search couldn't resolve in time is looked up in the background
+    cover_pending = album_data.mbid is not None and album_data.cover_url in (None, PLACEHOLDER_COVER_URL)
     new_album = Album(
         id=uuid.uuid4(),
         title=album_data.title,
         artist=album_data.artist,
         release_date=release_date,
-        cover_url=album_data.cover_url or "https://via.placeholder.com/500x500?text=No+Cover+Art"
+        cover_url=album_data.cover_url or PLACEHOLDER_COVER_URL,
+        musicbrainz_id=album_data.mbid,
+        cover_status=PENDING if cover_pending else "resolved"
     )
     
     db.add(new_album)
     db.commit()
     db.refresh(new_album)
+    suggestion_index.add_album(new_album)
+    if cover_pending:
+        cover_resolver.enqueue(new_album.id, album_data.mbid)
     
     return new_album
 
@@ -269,15 +361,9 @@ def add_album_from_search(album_data: AlbumSearchResult, db: Session = Depends(g
 def add_album_by_mbid(mbid: str, db: Session = Depends(get_db)):
     # fetches full album data from musicbrainz and adds to database
     try:
-        # get album details from musicbrainz
-        response = requests.get(
-            f"https://musicbrainz.org/ws/2/release/{mbid}",
-            params={"fmt": "json"},
-            headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
+        # one musicbrainz lookup gives the album with its description and runtime
+        details = get_release_details(mbid)
+        data = details.release
         
         # check if album already exists
         existing_album = db.query(Album).filter(
@@ -290,20 +376,27 @@ def add_album_by_mbid(mbid: str, db: Session = Depends(get_db)):
         
         # create new album
         artist_name = data['artist-credit'][0]['artist']['name'] if data.get('artist-credit') else "Unknown Artist"
-        cover_url = get_cover_art_url(mbid)
         release_date = parse_release_date(data.get('date', 'Unknown'))
         
+        # the cover is looked up in the background, clients poll /albums/covers for it
         new_album = Album(
             id=uuid.uuid4(),
             title=data['title'],
             artist=artist_name,
             release_date=release_date,
-            cover_url=cover_url
+            cover_url=PLACEHOLDER_COVER_URL,
+            description=details.description,
+            runtime_minutes=details.runtime_minutes,
+            metadata_checked_at=datetime.now(timezone.utc),
+            musicbrainz_id=mbid,
+            cover_status=PENDING
         )
         
         db.add(new_album)
         db.commit()
         db.refresh(new_album)
+        suggestion_index.add_album(new_album)
+        cover_resolver.enqueue(new_album.id, mbid)
         
         return new_album
         
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from musicbrainz import breakers, inflight
+from musicbrainz.client import http_client
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+# operational metrics for the worker that serves the request
+
+@router.get("/outbound")
+def get_outbound_metrics():
+    # connection reuse rate and latency per external host (musicbrainz, cover art archive),
+    # how many cache misses joined an identical request already in flight, and circuit breaker states
+    return {
+        "hosts": http_client.metrics(),
+        "coalescing": inflight.metrics(),
+        "breakers": {host: breaker.snapshot() for host, breaker in breakers.items()},
+    }
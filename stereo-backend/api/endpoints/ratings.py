@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
+from contextlib import contextmanager
 from uuid import UUID
 import uuid
 from datetime import date
 from pydantic import BaseModel, Field
+from sqlalchemy import literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 
 from database.database import get_db
-from database.models import Album, Rating
+from database.models import Rating
+from database.album_stats import apply_rating_change, refresh_album_stats
 
 router = APIRouter(prefix="/ratings", tags=["ratings"])
 
@@ -45,7 +50,11 @@ def create_rating(rating: RatingCreate, db: Session = Depends(get_db)):
         created_at=date.today()
     )
     db.add(db_rating)
-    db.commit()
+    with rating_write(db):
+        # the rating goes first, so a missing album or user fails its own foreign key, not the stats upsert
+        db.flush()
+        apply_rating_change(db, rating.album_id, new_rating=rating.rating)
+        db.commit()
     db.refresh(db_rating)
     return db_rating
 
@@ -56,51 +65,93 @@ def update_rating(rating_id: UUID, rating: RatingCreate, db: Session = Depends(g
     if not db_rating:
         raise HTTPException(status_code=404, detail="Rating not found")
     
+    old_album_id, old_rating = db_rating.album_id, db_rating.rating
     setattr(db_rating, 'album_id', rating.album_id)
     setattr(db_rating, 'user_id', rating.user_id)
     setattr(db_rating, 'rating', rating.rating)
     setattr(db_rating, 'updated_at', date.today())
     
-    db.commit()
+    with rating_write(db):
+        db.flush()
+        # moves the old value out of the aggregates and the new one in
+        if old_album_id == rating.album_id:
+            apply_rating_change(db, rating.album_id, old_rating, rating.rating)
+        else:
+            apply_rating_change(db, old_album_id, old_rating=old_rating)
+            apply_rating_change(db, rating.album_id, new_rating=rating.rating)
+        db.commit()
     db.refresh(db_rating)
     return db_rating
 
 
 @router.post("/albums/{album_id}/rate", response_model=RatingResponse)
 def rate_album(album_id: UUID, rating_value: int, user_id: UUID, db: Session = Depends(get_db)):
-    # updates existing rating or creates new one for user-album pair
+    # updates existing rating or creates new one for user-album pair in a single upsert
     # rating must be between 1-10
     if rating_value < 1 or rating_value > 10:
         raise HTTPException(status_code=400, detail="Rating must be between 1 and 10")
     
-    # check if album exists
-    album = db.query(Album).filter(Album.id == album_id).first()
-    if not album:
-        raise HTTPException(status_code=404, detail="Album not found")
+    # the user's current rating, locked until commit so the aggregates can be adjusted by the difference
+    # (a CTE in the upsert can't do this: it is only read for RETURNING, after the upsert touched the row)
+    previous_rating = db.execute(
+        select(Rating.rating).where(
+            Rating.album_id == album_id,
+            Rating.user_id == user_id
+        ).with_for_update()
+    ).scalar()
     
-    # check if user already rated this album
-    existing_rating = db.query(Rating).filter(
-        Rating.album_id == album_id,
-        Rating.user_id == user_id
-    ).first()
+    stmt = insert(Rating).values(
+        id=uuid.uuid4(),
+        album_id=album_id,
+        user_id=user_id,
+        rating=rating_value,
+        created_at=date.today()
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_ratings_album_id_user_id",
+        set_={"rating": stmt.excluded.rating, "updated_at": date.today()}
+    ).returning(
+        Rating.id,
+        Rating.album_id,
+        Rating.user_id,
+        Rating.rating,
+        literal_column("xmax = 0").label("inserted")  # postgres marks freshly inserted rows with xmax 0
+    )
     
-    if existing_rating:
-        # update existing rating
-        setattr(existing_rating, 'rating', rating_value)
-        setattr(existing_rating, 'updated_at', date.today())
-        db.commit()
-        db.refresh(existing_rating)
-        return existing_rating
+    try:
+        # a missing album fails the foreign key instead of needing its own lookup
+        saved = db.execute(stmt).one()
+    except IntegrityError as e:
+        db.rollback()
+        raise_missing_reference(e)
+    
+    if saved.inserted:
+        apply_rating_change(db, album_id, new_rating=rating_value)
+    elif previous_rating is not None:
+        apply_rating_change(db, album_id, previous_rating, rating_value)
     else:
-        # create new rating
-        new_rating = Rating(
-            id=uuid.uuid4(),
-            album_id=album_id,
-            user_id=user_id,
-            rating=rating_value,
-            created_at=date.today()
-        )
-        db.add(new_rating)
-        db.commit()
-        db.refresh(new_rating)
-        return new_rating
\ No newline at end of file
+        # the user's first rating from a concurrent request landed between the select and the upsert,
+        # so the value it replaced is unknown
+        refresh_album_stats(db, album_id)
+    
+    db.commit()
+    return RatingResponse.model_validate(saved)
+
+
+@contextmanager
+def rating_write(db: Session):
+    # wraps a rating write and its stats changes, turning constraint violations into client errors
+    try:
+        yield
+    except IntegrityError as e:
+        db.rollback()
+        raise_missing_reference(e)
+
+
+def raise_missing_reference(error: IntegrityError):
+    constraint = getattr(getattr(error.orig, 'diag', None), 'constraint_name', None)
+    if constraint == "uq_ratings_album_id_user_id":
+        raise HTTPException(status_code=400, detail="User has already rated this album")
+    if constraint == "ratings_user_id_fkey":
+        raise HTTPException(status_code=404, detail="User not found")
+    raise HTTPException(status_code=404, detail="Album not found")
@@ -5,9 +5,12 @@ from pydantic import BaseModel
 from sqlalchemy import func, desc
 
 from database.database import get_db
-from database.models import Album, User, Rating
-from .albums import AlbumResponse
+from database.models import Album, AlbumStats, User
+from database.album_stats import average_rating
+from database.text_search import album_matches, album_relevance, user_matches, user_relevance
+from .albums import AlbumResponse, hydrate_albums
 from .users import UserResponse
+from autocomplete import suggestion_index
 
 router = APIRouter(prefix="/search", tags=["search"])
 # unified search endpoints for all content types
@@ -35,38 +38,18 @@ def unified_search(
     search_term = q.strip().lower()
     
     # search albums
-    album_query = db.query(Album).filter(
-        (Album.title.ilike(f"%{search_term}%")) |
-        (Album.artist.ilike(f"%{search_term}%"))
-    )
+    album_query = db.query(Album).filter(album_matches(search_term))
     
-    albums = album_query.limit(limit).all()
+    albums = album_query.order_by(album_relevance(search_term).desc()).limit(limit).all()
     total_albums = album_query.count()
     
     # add average ratings to albums
-    albums_with_ratings = []
-    for album in albums:
-        avg_rating = db.query(func.avg(Rating.rating)).filter(Rating.album_id == album.id).scalar()
-        album_dict = {
-            "id": album.id,
-            "title": album.title,
-            "artist": album.artist,
-            "release_date": album.release_date,
-            "cover_url": album.cover_url,
-            "description": album.description,
-            "runtime_minutes": album.runtime_minutes,
-            "musicbrainz_id": album.musicbrainz_id,
-            "average_rating": round(avg_rating, 1) if avg_rating else None
-        }
-        albums_with_ratings.append(AlbumResponse(**album_dict))
+    albums_with_ratings = hydrate_albums(db, albums)
     
     # search users
-    user_query = db.query(User).filter(
-        (User.username.ilike(f"%{search_term}%")) |
-        (User.email.ilike(f"%{search_term}%"))
-    )
+    user_query = db.query(User).filter(user_matches(search_term))
     
-    users = user_query.limit(limit).all()
+    users = user_query.order_by(user_relevance(search_term).desc()).limit(limit).all()
     total_users = user_query.count()
     
     return UnifiedSearchResult(
@@ -93,10 +76,7 @@ def search_albums_advanced(
     search_term = q.strip().lower()
     
     # base query
-    query = db.query(Album).filter(
-        (Album.title.ilike(f"%{search_term}%")) |
-        (Album.artist.ilike(f"%{search_term}%"))
-    )
+    query = db.query(Album).filter(album_matches(search_term))
     
     # apply filters
     if artist:
@@ -108,44 +88,28 @@ def search_albums_advanced(
     if year_to:
         query = query.filter(func.extract('year', Album.release_date) <= year_to)
     
-    # combines album and rating data for advanced filtering and sorting
+    # joins the per-album aggregates for rating filters and sorting
     if min_rating or max_rating or sort_by in ["rating", "popularity"]:
-        query = query.outerjoin(Rating, Album.id == Rating.album_id)
+        query = query.outerjoin(AlbumStats, Album.id == AlbumStats.album_id)
         
         if min_rating:
-            avg_rating_subq = db.query(
-                Rating.album_id,
-                func.avg(Rating.rating).label('avg_rating')
-            ).group_by(Rating.album_id).subquery()
-            
-            query = query.join(avg_rating_subq, Album.id == avg_rating_subq.c.album_id)
-            query = query.filter(avg_rating_subq.c.avg_rating >= min_rating)
+            query = query.filter(average_rating >= min_rating)
         
         if max_rating:
-            avg_rating_subq = db.query(
-                Rating.album_id,
-                func.avg(Rating.rating).label('avg_rating')
-            ).group_by(Rating.album_id).subquery()
-            
-            query = query.join(avg_rating_subq, Album.id == avg_rating_subq.c.album_id)
-            query = query.filter(avg_rating_subq.c.avg_rating <= max_rating)
+            query = query.filter(average_rating <= max_rating)
     
     # apply sorting
     if sort_by == "date":
         query = query.order_by(desc(Album.release_date))
     elif sort_by == "rating":
-        query = query.group_by(Album.id).order_by(desc(func.avg(Rating.rating)))
+        query = query.order_by(desc(average_rating).nulls_last())
     elif sort_by == "popularity":
-        query = query.group_by(Album.id).order_by(desc(func.count(Rating.id)))
+        query = query.order_by(desc(func.coalesce(AlbumStats.rating_count, 0)))
     else:  # relevance (default)
-        # prioritizes exact prefix matches over partial matches
-        query = query.order_by(
-            Album.title.ilike(f"{search_term}%").desc(),
-            Album.artist.ilike(f"{search_term}%").desc(),
-            Album.title
-        )
-    
-    return query.offset(offset).limit(limit).all()
+        # full-text rank plus trigram similarity, so close spellings still score
+        query = query.order_by(album_relevance(search_term).desc(), Album.title)
+    
+    return hydrate_albums(db, query.offset(offset).limit(limit).all())
 
 @router.get("/users", response_model=List[UserResponse])
 def search_users(
@@ -157,12 +121,9 @@ def search_users(
     # searches for users by username or email
     search_term = q.strip().lower()
     
-    users = db.query(User).filter(
-        (User.username.ilike(f"%{search_term}%")) |
-        (User.email.ilike(f"%{search_term}%"))
-    ).order_by(
-        # prioritizes exact username prefix matches
-        User.username.ilike(f"{search_term}%").desc(),
+    users = db.query(User).filter(user_matches(search_term)).order_by(
+        # closest username/email spellings first
+        user_relevance(search_term).desc(),
         User.username
     ).offset(offset).limit(limit).all()
     
@@ -170,31 +131,10 @@ def search_users(
 
 @router.get("/suggestions")
 def search_suggestions(
-    q: str = Query(..., min_length=1),
-    db: Session = Depends(get_db)
+    q: str = Query(..., min_length=1)
 ):
-    # provides search suggestions for autocomplete
-    search_term = q.strip().lower()
-    
-    # get album suggestions
-    album_titles = db.query(Album.title).filter(
-        Album.title.ilike(f"{search_term}%")
-    ).limit(5).all()
-    
-    album_artists = db.query(Album.artist).filter(
-        Album.artist.ilike(f"{search_term}%")
-    ).distinct().limit(5).all()
-    
-    # get user suggestions
-    usernames = db.query(User.username).filter(
-        User.username.ilike(f"{search_term}%")
-    ).limit(3).all()
-    
-    return {
-        "albums": [title[0] for title in album_titles],
-        "artists": [artist[0] for artist in album_artists],
-        "users": [username[0] for username in usernames]
-    }
+    # provides search suggestions for autocomplete from the in-memory prefix index
+    return suggestion_index.suggest(q)
 
 @router.get("/trending-searches")
 def trending_searches(db: Session = Depends(get_db)):
@@ -202,8 +142,8 @@ def trending_searches(db: Session = Depends(get_db)):
     # would track search queries and return most frequent
     popular_artists = db.query(
         Album.artist,
-        func.count(Rating.id).label('rating_count')
-    ).outerjoin(Rating, Album.id == Rating.album_id
+        func.coalesce(func.sum(AlbumStats.rating_count), 0).label('rating_count')
+    ).outerjoin(AlbumStats, Album.id == AlbumStats.album_id
     ).group_by(Album.artist
     ).order_by(desc('rating_count')
     ).limit(10).all()
@@ -6,9 +6,8 @@ from datetime import date
 from pydantic import BaseModel
 
 from database.database import get_db
-from database.models import Album, TrendingAlbum, Rating
-from sqlalchemy import func
-from .albums import AlbumResponse
+from database.models import Album, TrendingAlbum
+from .albums import AlbumResponse, hydrate_albums
 
 router = APIRouter(prefix="/trending", tags=["trending"])
 # sets up trending endpoints with proper routing and api docs grouping
@@ -37,27 +36,8 @@ def get_trending(db: Session = Depends(get_db)):
     if not trending_albums: 
         raise HTTPException(status_code=404, detail="No trending albums found")
     
-    # add average rating to each album
-    result = []
-    for album, trending in trending_albums:
-        # calculate average rating
-        avg_rating = db.query(func.avg(Rating.rating)).filter(Rating.album_id == album.id).scalar()
-        
-        # create album response with average rating
-        album_dict = {
-            "id": album.id,
-            "title": album.title,
-            "artist": album.artist,
-            "release_date": album.release_date,
-            "cover_url": album.cover_url,
-            "description": album.description,
-            "runtime_minutes": album.runtime_minutes,
-            "musicbrainz_id": album.musicbrainz_id,
-            "average_rating": round(avg_rating, 1) if avg_rating else None
-        }
-        result.append(AlbumResponse(**album_dict))
-    
-    return result
+    # add average rating and rating count to each album in one query
+    return hydrate_albums(db, [album for album, trending in trending_albums])
 
 @router.post("/", response_model=TrendingAlbumResponse)
 def create_trending_album(
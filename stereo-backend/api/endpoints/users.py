@@ -10,6 +10,7 @@ from pydantic import BaseModel
 from database.database import get_db
 from database.models import User
 from password_hashing import hash_password, verify_password
+from autocomplete import suggestion_index
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -55,6 +56,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        suggestion_index.add_user(db_user)
         return db_user
     except Exception as e:
         db.rollback()
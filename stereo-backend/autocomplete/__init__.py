@@ -0,0 +1,201 @@
+"""
+In-memory prefix index behind /search/suggestions.
+
+Album titles, artist names and usernames are kept sorted by their lowercased text, so
+every prefix maps to one contiguous range found with two binary searches. A segment tree
+over that array stores, per node, the position of the most popular entry beneath it;
+the top-k entries of any range come out of a best-first walk down the tree in
+O(k log n), no matter how wide the range is or how popularity is distributed.
+
+Entries added after the last build go into a small sorted side list that queries merge
+in; once it grows past RECENT_LIMIT it is folded into the main arrays and the tree is
+rebuilt. Recent answers are kept in an LRU cache.
+
+The index is built at startup and extended as albums and users are created through the
+api. Scores are a snapshot of rating counts from the last build, and rows written by the
+offline scripts appear after a restart.
+"""
+import bisect
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.models import Album, AlbumStats, Rating, User
+
+RECENT_LIMIT = 1024
+CACHE_SIZE = 4096
+
+
+def normalize(text: str) -> str:
+    return text.strip().casefold()
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = set()
+        # parallel arrays sorted by (key, text)
+        self._keys = []
+        self._texts = []
+        self._scores = []
+        self._tree = array("i")
+        self._size = 0
+        self._recent = []  # sorted (key, text, score) added since the last build
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def load(self, entries):
+        # bulk (entry id, text, score) load, replaces the current contents
+        ids, rows = set(), []
+        for entry_id, text, score in entries:
+            if entry_id not in ids:
+                ids.add(entry_id)
+                rows.append((normalize(text), text, score))
+        rows.sort()
+        with self._lock:
+            self._ids = ids
+            self._recent = []
+            self._rebuild(rows)
+
+    def add(self, entry_id, text: str, score: int = 0):
+        # inserts a new entry, existing ids are left alone
+        with self._lock:
+            if entry_id in self._ids:
+                return
+            self._ids.add(entry_id)
+            bisect.insort(self._recent, (normalize(text), text, score))
+            if len(self._recent) > RECENT_LIMIT:
+                merged = list(heapq.merge(zip(self._keys, self._texts, self._scores), self._recent))
+                self._recent = []
+                self._rebuild(merged)
+            self._cache.clear()
+
+    def _rebuild(self, rows):
+        # lays out the sorted rows and builds the max-score segment tree over them
+        self._keys = [key for key, _, _ in rows]
+        self._texts = [text for _, text, _ in rows]
+        self._scores = scores = [score for _, _, score in rows]
+        size = 1
+        while size < len(rows):
+            size *= 2
+        tree = array("i", [-1]) * (2 * size)
+        tree[size:size + len(rows)] = array("i", range(len(rows)))
+        for node in range(size - 1, 0, -1):
+            left, right = tree[2 * node], tree[2 * node + 1]
+            # ties keep the left (alphabetically earlier) entry
+            tree[node] = left if right < 0 or scores[left] >= scores[right] else right
+        self._tree, self._size = tree, size
+        self._cache.clear()
+
+    def _top_positions(self, lo: int, hi: int, k: int) -> list[int]:
+        # best-first walk: start from the nodes covering [lo, hi), always expand the best one
+        tree, size, scores = self._tree, self._size, self._scores
+        heap = []
+
+        def push(node):
+            position = tree[node]
+            if position >= 0:
+                heapq.heappush(heap, (-scores[position], position, node))
+
+        left, right = lo + size, hi + size
+        while left < right:
+            if left & 1:
+                push(left)
+                left += 1
+            if right & 1:
+                right -= 1
+                push(right)
+            left >>= 1
+            right >>= 1
+
+        positions = []
+        while heap and len(positions) < k:
+            _, position, node = heapq.heappop(heap)
+            if node >= size:
+                positions.append(position)
+            else:
+                push(2 * node)
+                push(2 * node + 1)
+        return positions
+
+    def complete(self, prefix: str, k: int) -> list[str]:
+        # top-k texts starting with prefix, most popular first, ties alphabetical
+        key = normalize(prefix)
+        end = key + "\U0010ffff"
+        with self._lock:
+            cached = self._cache.get((key, k))
+            if cached is not None:
+                self._cache.move_to_end((key, k))
+                return cached
+
+            lo = bisect.bisect_left(self._keys, key)
+            hi = bisect.bisect_left(self._keys, end, lo)
+            candidates = [
+                (self._keys[position], self._texts[position], self._scores[position])
+                for position in self._top_positions(lo, hi, k)
+            ]
+            recent_lo = bisect.bisect_left(self._recent, (key,))
+            recent_hi = bisect.bisect_left(self._recent, (end,), recent_lo)
+            candidates.extend(self._recent[recent_lo:recent_hi])
+            best = sorted(candidates, key=lambda entry: (-entry[2], entry[0], entry[1]))[:k]
+            results = [text for _, text, _ in best]
+
+            self._cache[(key, k)] = results
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return results
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self.albums = PrefixIndex()
+        self.artists = PrefixIndex()
+        self.users = PrefixIndex()
+
+    def build(self, db: Session):
+        """
+        Load every album, artist and user with their rating counts.
+        Albums score by ratings received, artists by ratings across their albums,
+        users by ratings given.
+        """
+        album_rows = db.query(
+            Album.id, Album.title, Album.artist, func.coalesce(AlbumStats.rating_count, 0)
+        ).outerjoin(AlbumStats, Album.id == AlbumStats.album_id).yield_per(10000)
+
+        album_entries = []
+        artist_scores = {}
+        for album_id, title, artist, rating_count in album_rows:
+            album_entries.append((album_id, title, rating_count))
+            artist_scores[artist] = artist_scores.get(artist, 0) + rating_count
+
+        user_rows = db.query(User.id, User.username, func.count(Rating.id)).outerjoin(
+            Rating, User.id == Rating.user_id
+        ).group_by(User.id).yield_per(10000)
+
+        self.albums.load(album_entries)
+        self.artists.load((artist, artist, score) for artist, score in artist_scores.items())
+        self.users.load(user_rows)
+
+    def add_album(self, album: Album):
+        self.albums.add(album.id, album.title)
+        self.artists.add(album.artist, album.artist)
+
+    def add_user(self, user: User):
+        self.users.add(user.id, user.username)
+
+    def suggest(self, q: str) -> dict:
+        return {
+            "albums": self.albums.complete(q, 5),
+            "artists": self.artists.complete(q, 5),
+            "users": self.users.complete(q, 3)
+        }
+
+
+# process-wide index, built in main.py on startup
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,208 @@
+"""
+Background cover art resolution.
+
+Albums added from MusicBrainz are written straight away with the placeholder cover and
+cover_status 'pending'. A small pool of worker threads looks the covers up through the
+musicbrainz client (cached and rate limited like every other outbound call) and writes
+cover_url, marking the album 'resolved', or 'missing' when the release has no art.
+
+Failed lookups are retried after each delay in RETRY_DELAYS; once those run out the
+album is marked 'missing'. The attempt count and next retry time are stored on the row,
+so pending covers outlive the process: start() queues every pending album it finds,
+including ones left behind by the import scripts.
+
+Every api worker and import script runs its own resolver over the same albums, so a
+lookup is claimed in the database before it goes out: the claim moves cover_retry_at
+CLAIM_LEASE seconds ahead, only if the album is still pending and due. Other processes
+holding the album skip it and look again once the lease has passed, which also picks
+up lookups abandoned by a process that died mid-claim.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+import musicbrainz
+from database.database import LocalSession
+from database.models import Album
+from musicbrainz import BACKGROUND, PLACEHOLDER_COVER_URL
+
+PENDING = "pending"
+RESOLVED = "resolved"
+MISSING = "missing"
+
+# seconds to wait before each retry of a failed lookup
+RETRY_DELAYS = (30, 120, 600, 3600, 6 * 3600)
+LOOKUP_TIMEOUT = 10
+# how long a claimed lookup is left to its process before another may take it over
+CLAIM_LEASE = 5 * 60
+
+
+class CoverResolver:
+    def __init__(self, session_factory=LocalSession, workers: int = 4):
+        self.session_factory = session_factory
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (due, seq, album_id, mbid, attempts), due on the monotonic clock
+        self._seq = itertools.count()
+        self._queued = set()  # album ids waiting in the heap
+        self._in_flight = 0
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        """Start the workers and queue every album whose cover is still pending."""
+        with self._cond:
+            if not self._threads:
+                self._stopping = False
+                self._threads = [
+                    threading.Thread(target=self._work, name=f"cover-resolver-{i}", daemon=True)
+                    for i in range(self.workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+        db = self.session_factory()
+        try:
+            pending = db.query(Album.id, Album.musicbrainz_id, Album.cover_attempts, Album.cover_retry_at).filter(
+                Album.cover_status == PENDING, Album.musicbrainz_id.isnot(None)
+            ).all()
+        finally:
+            db.close()
+        for album_id, mbid, attempts, retry_at in pending:
+            self.enqueue(album_id, mbid, attempts, retry_at)
+
+    def enqueue(self, album_id, mbid: str, attempts: int = 0, retry_at: datetime | None = None):
+        """Queue a cover lookup, due now or at retry_at."""
+        delay = 0.0
+        if retry_at is not None:
+            delay = max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        with self._cond:
+            if album_id in self._queued:
+                return
+            self._queued.add(album_id)
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._seq), album_id, mbid, attempts))
+            self._cond.notify()
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Wait until no lookup is due or running. Retries scheduled for later stay pending.
+        Returns False if the timeout ran out first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._in_flight or (self._queue and self._queue[0][0] <= time.monotonic()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 1)
+        return True
+
+    def stop(self):
+        # queued lookups are dropped, their albums stay pending for the next start()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join()
+        with self._cond:
+            self._queue.clear()
+            self._queued.clear()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._queued) + self._in_flight
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    now = time.monotonic()
+                    if self._queue and self._queue[0][0] <= now:
+                        break
+                    self._cond.wait(self._queue[0][0] - now if self._queue else None)
+                if self._stopping:
+                    return
+                _, _, album_id, mbid, attempts = heapq.heappop(self._queue)
+                self._queued.discard(album_id)
+                self._in_flight += 1
+            try:
+                attempts = self._claim(album_id, mbid)
+                if attempts is not None:
+                    self._resolve(album_id, mbid, attempts)
+            except Exception as e:
+                print(f"Cover resolver error for album {album_id}: {e}")
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _claim(self, album_id, mbid: str) -> int | None:
+        """
+        Claim the album's lookup for this process, returning its failed attempts so far.
+        Returns None when it isn't ours to look up now: another process holds it or has
+        scheduled its retry (it is queued again for then), or it is no longer pending.
+        """
+        db = self.session_factory()
+        try:
+            # one statement, so of several processes racing for the album exactly one sees it due
+            attempts = db.execute(
+                update(Album)
+                .where(Album.id == album_id, Album.cover_status == PENDING,
+                       or_(Album.cover_retry_at.is_(None), Album.cover_retry_at <= func.now()))
+                .values(cover_retry_at=func.now() + timedelta(seconds=CLAIM_LEASE))
+                .returning(Album.cover_attempts)
+            ).scalar()
+            db.commit()
+            if attempts is not None:
+                return attempts
+            retry_at = db.execute(
+                select(Album.cover_retry_at).where(Album.id == album_id, Album.cover_status == PENDING)
+            ).first()
+        finally:
+            db.close()
+        if retry_at is not None:
+            self.enqueue(album_id, mbid, retry_at=retry_at[0])
+        return None
+
+    def _resolve(self, album_id, mbid: str, attempts: int):
+        try:
+            cover_url = musicbrainz.fetch_cover_art_url(mbid, timeout=LOOKUP_TIMEOUT, priority=BACKGROUND)
+        except requests.RequestException as e:
+            self._retry_later(album_id, mbid, attempts + 1, e)
+            return
+        try:
+            self._store(album_id,
+                        cover_url=cover_url or PLACEHOLDER_COVER_URL,
+                        cover_status=RESOLVED if cover_url else MISSING,
+                        cover_retry_at=None)
+        except SQLAlchemyError as e:
+            self._retry_later(album_id, mbid, attempts + 1, e)
+
+    def _retry_later(self, album_id, mbid: str, attempts: int, error: Exception):
+        if attempts > len(RETRY_DELAYS):
+            print(f"Giving up on cover for album {album_id} after {attempts} attempts: {error}")
+            self._store(album_id, cover_status=MISSING, cover_attempts=attempts, cover_retry_at=None)
+            return
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=RETRY_DELAYS[attempts - 1])
+        self.enqueue(album_id, mbid, attempts, retry_at)
+        self._store(album_id, cover_attempts=attempts, cover_retry_at=retry_at)
+
+    def _store(self, album_id, **values):
+        # only touches albums that are still pending, so a cover set by hand is never overwritten
+        db = self.session_factory()
+        try:
+            db.execute(update(Album).where(Album.id == album_id, Album.cover_status == PENDING).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+
+cover_resolver = CoverResolver(workers=int(os.getenv("COVER_RESOLVER_WORKERS", "4")))
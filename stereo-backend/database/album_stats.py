@@ -0,0 +1,76 @@
+# keeps the album_stats aggregate table in step with the ratings table
+from sqlalchemy import Float, cast, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .models import AlbumStats, Rating
+
+HISTOGRAM_COLUMNS = {value: f"histogram_{value}" for value in range(1, 11)}
+STATS_COLUMNS = ["album_id", "rating_count", "rating_sum", *HISTOGRAM_COLUMNS.values()]
+
+# average rating as a sql expression, null for albums without ratings
+average_rating = cast(AlbumStats.rating_sum, Float) / func.nullif(AlbumStats.rating_count, 0)
+
+
+def apply_rating_change(db: Session, album_id, old_rating: int | None = None, new_rating: int | None = None):
+    """
+    Adjust one album's aggregates for a rating that was added, changed or removed.
+    Runs inside the caller's transaction so the stats commit or roll back with the rating.
+    """
+    values = {
+        "album_id": album_id,
+        "rating_count": (new_rating is not None) - (old_rating is not None),
+        "rating_sum": (new_rating or 0) - (old_rating or 0),
+    }
+    if old_rating is not None:
+        values[HISTOGRAM_COLUMNS[old_rating]] = -1
+    if new_rating is not None:
+        column = HISTOGRAM_COLUMNS[new_rating]
+        values[column] = values.get(column, 0) + 1
+
+    # single upsert: creates the row for an album's first rating, otherwise adds the deltas
+    stmt = insert(AlbumStats).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AlbumStats.album_id],
+        set_={
+            column: getattr(AlbumStats, column) + getattr(stmt.excluded, column)
+            for column in values if column != "album_id"
+        }
+    )
+    db.execute(stmt)
+
+
+def _aggregates_by_album():
+    # select producing one album_stats row per album straight from the ratings table
+    return select(
+        Rating.album_id,
+        func.count(Rating.id),
+        func.sum(Rating.rating),
+        *[func.count(Rating.id).filter(Rating.rating == value) for value in HISTOGRAM_COLUMNS]
+    ).group_by(Rating.album_id)
+
+
+def refresh_album_stats(db: Session, album_id):
+    """
+    Recompute one album's aggregates from its ratings.
+    Used when a write can't tell what value it replaced.
+    """
+    stmt = insert(AlbumStats).from_select(STATS_COLUMNS, _aggregates_by_album().where(Rating.album_id == album_id))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AlbumStats.album_id],
+        set_={column: getattr(stmt.excluded, column) for column in STATS_COLUMNS if column != "album_id"}
+    )
+    db.execute(stmt)
+
+
+def rebuild_album_stats(db: Session) -> int:
+    """
+    Recompute album_stats from scratch out of the ratings table.
+    Returns the number of albums that have ratings.
+    """
+    # block rating writes until commit so nothing slips between the scan and the swap
+    db.execute(text("LOCK TABLE ratings IN SHARE MODE"))
+    db.query(AlbumStats).delete()
+
+    result = db.execute(insert(AlbumStats).from_select(STATS_COLUMNS, _aggregates_by_album()))
+    return result.rowcount
@@ -0,0 +1,10 @@
+"""
+creates any tables that don't exist yet from the current models
+databases created by the old create_all-at-startup keep their tables untouched
+there is no downgrade: it would have to drop every table, including ones that predate migrations
+"""
+from database.models import Base
+
+
+def upgrade(conn):
+    Base.metadata.create_all(bind=conn, checkfirst=True)
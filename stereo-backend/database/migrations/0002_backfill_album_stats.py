@@ -0,0 +1,15 @@
+"""
+fills album_stats for databases that had ratings before the aggregates existed
+"""
+from sqlalchemy.orm import Session
+
+from database.album_stats import rebuild_album_stats
+
+
+def upgrade(conn):
+    rebuild_album_stats(Session(bind=conn))
+
+
+def downgrade(conn):
+    # the aggregates are derived data, nothing to undo
+    pass
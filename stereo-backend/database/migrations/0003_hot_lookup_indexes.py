@@ -0,0 +1,24 @@
+"""
+indexes for the columns the endpoints filter, join and sort on
+list_items.list_id is already covered by the (list_id, album_id) unique constraint
+and ratings.album_id by the leading column of ix_ratings_album_id_user_id
+"""
+from sqlalchemy import text
+
+INDEXES = {
+    "ix_ratings_album_id_user_id": "ratings (album_id, user_id)",
+    "ix_reviews_album_id": "reviews (album_id)",
+    "ix_trending_albums_rank": "trending_albums (rank)",
+    "ix_albums_musicbrainz_id": "albums (musicbrainz_id)",
+    "ix_lists_user_id": "lists (user_id)",
+}
+
+
+def upgrade(conn):
+    for name, target in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+
+
+def downgrade(conn):
+    for name in INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
@@ -0,0 +1,40 @@
+"""
+enforces one rating per (album_id, user_id) so rate_album can upsert
+keeps the most recently touched rating of any existing duplicates, then rebuilds
+album_stats since removing duplicates changes the aggregates
+the unique index replaces ix_ratings_album_id_user_id from 0003
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.album_stats import rebuild_album_stats
+
+
+def upgrade(conn):
+    exists = conn.execute(text(
+        "SELECT 1 FROM pg_constraint WHERE conname = 'uq_ratings_album_id_user_id'"
+    )).first()
+    if not exists:
+        conn.execute(text("""
+            DELETE FROM ratings
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (
+                        PARTITION BY album_id, user_id
+                        ORDER BY coalesce(updated_at, created_at) DESC, id
+                    ) AS position
+                    FROM ratings
+                ) ranked
+                WHERE position > 1
+            )
+        """))
+        conn.execute(text(
+            "ALTER TABLE ratings ADD CONSTRAINT uq_ratings_album_id_user_id UNIQUE (album_id, user_id)"
+        ))
+        rebuild_album_stats(Session(bind=conn))
+    conn.execute(text("DROP INDEX IF EXISTS ix_ratings_album_id_user_id"))
+
+
+def downgrade(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ratings_album_id_user_id ON ratings (album_id, user_id)"))
+    conn.execute(text("ALTER TABLE ratings DROP CONSTRAINT IF EXISTS uq_ratings_album_id_user_id"))
@@ -0,0 +1,37 @@
+"""
+full-text and trigram search support
+albums get a generated tsvector over title (weight A) and artist (weight B) with a gin
+index for ranked matching, and pg_trgm gin indexes back substring (ilike '%x%') and
+fuzzy (%) matching on album titles/artists and usernames/emails
+search_vector is deliberately not mapped on the Album model so ordinary album
+queries don't drag it along
+"""
+from sqlalchemy import text
+
+TRIGRAM_INDEXES = {
+    "ix_albums_title_trgm": "albums USING gin (title gin_trgm_ops)",
+    "ix_albums_artist_trgm": "albums USING gin (artist gin_trgm_ops)",
+    "ix_users_username_trgm": "users USING gin (username gin_trgm_ops)",
+    "ix_users_email_trgm": "users USING gin (email gin_trgm_ops)",
+}
+
+
+def upgrade(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text("""
+        ALTER TABLE albums ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(artist, '')), 'B')
+        ) STORED
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_albums_search_vector ON albums USING gin (search_vector)"))
+    for name, target in TRIGRAM_INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+
+
+def downgrade(conn):
+    for name in TRIGRAM_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_albums_search_vector"))
+    conn.execute(text("ALTER TABLE albums DROP COLUMN IF EXISTS search_vector"))
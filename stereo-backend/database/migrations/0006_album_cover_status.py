@@ -0,0 +1,27 @@
+"""
+cover art is resolved in the background, albums track where their cover lookup stands
+existing albums already have their cover (or the placeholder) so they start out resolved
+the partial index lets the resolver find pending covers without scanning the albums table
+"""
+from sqlalchemy import text
+
+COLUMNS = {
+    "cover_status": "VARCHAR NOT NULL DEFAULT 'resolved'",
+    "cover_attempts": "INTEGER NOT NULL DEFAULT 0",
+    "cover_retry_at": "TIMESTAMP WITH TIME ZONE",
+}
+
+
+def upgrade(conn):
+    for name, definition in COLUMNS.items():
+        conn.execute(text(f"ALTER TABLE albums ADD COLUMN IF NOT EXISTS {name} {definition}"))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_albums_cover_pending ON albums (cover_retry_at)
+        WHERE cover_status = 'pending'
+    """))
+
+
+def downgrade(conn):
+    conn.execute(text("DROP INDEX IF EXISTS ix_albums_cover_pending"))
+    for name in COLUMNS:
+        conn.execute(text(f"ALTER TABLE albums DROP COLUMN IF EXISTS {name}"))
@@ -0,0 +1,31 @@
+"""
+import runs and per-query checkpoints so scripts/import_albums.py --resume can continue an
+interrupted run; albums, checkpoints and run counters are committed together per batch
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS import_runs (
+            id UUID PRIMARY KEY,
+            importer VARCHAR NOT NULL,
+            started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            finished_at TIMESTAMP WITH TIME ZONE,
+            imported_count INTEGER NOT NULL DEFAULT 0,
+            rejected_count INTEGER NOT NULL DEFAULT 0
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            run_id UUID NOT NULL REFERENCES import_runs (id) ON DELETE CASCADE,
+            query VARCHAR NOT NULL,
+            completed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (run_id, query)
+        )
+    """))
+
+
+def downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS import_checkpoints"))
+    conn.execute(text("DROP TABLE IF EXISTS import_runs"))
@@ -0,0 +1,23 @@
+"""
+incremental catalog sync: import runs record their mode, and each query family keeps the
+newest release date it has seen so scripts/import_albums.py --incremental can search from there
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE import_runs ADD COLUMN IF NOT EXISTS mode VARCHAR NOT NULL DEFAULT 'full'"))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS import_sync_state (
+            importer VARCHAR NOT NULL,
+            family VARCHAR NOT NULL,
+            high_water_date DATE,
+            last_run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (importer, family)
+        )
+    """))
+
+
+def downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS import_sync_state"))
+    conn.execute(text("ALTER TABLE import_runs DROP COLUMN IF EXISTS mode"))
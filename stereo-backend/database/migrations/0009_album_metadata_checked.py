@@ -0,0 +1,19 @@
+"""
+albums remember when their description and runtime were last looked up, so the metadata backfill
+can tell "musicbrainz has none" (checked, still null) from "never fetched" (not checked)
+the partial index lets the backfill page through unchecked albums without scanning the table
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("ALTER TABLE albums ADD COLUMN IF NOT EXISTS metadata_checked_at TIMESTAMP WITH TIME ZONE"))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_albums_metadata_unchecked ON albums (id)
+        WHERE metadata_checked_at IS NULL AND musicbrainz_id IS NOT NULL
+    """))
+
+
+def downgrade(conn):
+    conn.execute(text("DROP INDEX IF EXISTS ix_albums_metadata_unchecked"))
+    conn.execute(text("ALTER TABLE albums DROP COLUMN IF EXISTS metadata_checked_at"))
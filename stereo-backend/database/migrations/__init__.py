@@ -0,0 +1,149 @@
+"""
+Versioned schema migrations.
+
+Each migration is a module in this package named NNNN_description.py that defines
+upgrade(conn) and optionally downgrade(conn). Applied versions are recorded in the
+schema_migrations table, and every migration runs in its own transaction together
+with its version row, so a failed migration leaves nothing half applied.
+
+0001 creates any missing tables straight from the models, which means a fresh
+database already has the current schema when later migrations run. Later
+migrations must therefore be idempotent (IF NOT EXISTS / IF EXISTS). 0001 has no
+downgrade (reverting it would drop every table), so 1 is the lowest downgrade target.
+
+Only scripts/migrate.py changes the schema; the other scripts compare current()
+with head() and refuse to run against an outdated database.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+MIGRATIONS_TABLE = "schema_migrations"
+# arbitrary key so concurrent deploys don't run the same migration twice
+ADVISORY_LOCK_KEY = 20250701
+
+
+class Migration:
+    def __init__(self, version: int, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+
+    def upgrade(self, conn):
+        self.module.upgrade(conn)
+
+    @property
+    def reversible(self) -> bool:
+        return hasattr(self.module, "downgrade")
+
+    def downgrade(self, conn):
+        if not self.reversible:
+            raise RuntimeError(f"migration {self.version:04d}_{self.name} cannot be reverted")
+        self.module.downgrade(conn)
+
+
+def load_migrations() -> list[Migration]:
+    # finds NNNN_name modules in this package, ordered by version
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        version, _, name = module_info.name.partition("_")
+        if not version.isdigit():
+            continue
+        module = importlib.import_module(f"{__name__}.{module_info.name}")
+        migrations.append(Migration(int(version), name, module))
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+def _ensure_migrations_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """))
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.begin() as conn:
+        _ensure_migrations_table(conn)
+        rows = conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}")).all()
+    return {row[0] for row in rows}
+
+
+def current(engine: Engine) -> int:
+    """Highest applied version, 0 for a database that was never migrated. Read only."""
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT to_regclass(:table)"), {"table": MIGRATIONS_TABLE}).scalar() is None:
+            return 0
+        return conn.execute(text(f"SELECT coalesce(max(version), 0) FROM {MIGRATIONS_TABLE}")).scalar()
+
+
+def head() -> int:
+    """Version of the newest migration."""
+    return load_migrations()[-1].version
+
+
+def upgrade(engine: Engine, target: int | None = None) -> list[Migration]:
+    """
+    Apply every pending migration up to and including target (default: latest).
+    Returns the migrations that were applied.
+    """
+    applied = []
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            done = applied_versions(engine)
+            for migration in load_migrations():
+                if migration.version in done or (target is not None and migration.version > target):
+                    continue
+                with engine.begin() as conn:
+                    migration.upgrade(conn)
+                    conn.execute(
+                        text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                        {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+                    )
+                applied.append(migration)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            lock_conn.commit()
+    return applied
+
+
+def downgrade(engine: Engine, target: int) -> list[Migration]:
+    """
+    Revert applied migrations newer than target, newest first.
+    Returns the migrations that were reverted. Raises RuntimeError, before reverting
+    anything, when one of them has no downgrade.
+    """
+    irreversible = [
+        migration for migration in load_migrations()
+        if migration.version > target and not migration.reversible
+    ]
+    if irreversible:
+        first = irreversible[-1]
+        raise RuntimeError(f"migration {first.version:04d}_{first.name} cannot be reverted, "
+                           f"downgrade to {first.version} or later")
+    reverted = []
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            done = applied_versions(engine)
+            for migration in reversed(load_migrations()):
+                if migration.version not in done or migration.version <= target:
+                    continue
+                with engine.begin() as conn:
+                    migration.downgrade(conn)
+                    conn.execute(
+                        text(f"DELETE FROM {MIGRATIONS_TABLE} WHERE version = :version"),
+                        {"version": migration.version}
+                    )
+                reverted.append(migration)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            lock_conn.commit()
+    return reverted
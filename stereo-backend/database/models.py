@@ -1,7 +1,7 @@
 import uuid
 #uuid is a python library for generating unique identifiers
 from datetime import date # date class for date values
-from sqlalchemy import Column, String, Integer, Date, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import Column, String, Integer, Date, DateTime, ForeignKey, Boolean, UniqueConstraint
 
 from sqlalchemy.dialects.postgresql import UUID #postgresql uuid
 from .database import Base
@@ -13,6 +13,8 @@ from .database import Base
 #uuid is a universally unique identifier, used to uniquely identify rows in the database
 #primary_key is a unique identifier for each row in the table
 #nullable=False means that the column cannot be null, it must have a value
+#index=True adds a b-tree index for columns the api filters or sorts on
+#schema changes go through database/migrations, run with scripts/migrate.py
 
 class Album(Base):
     __tablename__ = "albums"
@@ -23,14 +25,20 @@ class Album(Base):
     cover_url = Column(String, nullable=False)
     description = Column(String, nullable=True)  # album description from musicbrainz annotation
     runtime_minutes = Column(Integer, nullable=True)  # total album runtime in minutes
-    musicbrainz_id = Column(String, nullable=True)  # musicbrainz release id for api calls
+    musicbrainz_id = Column(String, nullable=True, index=True)  # musicbrainz release id for api calls
+    # pending covers show the placeholder until the background resolver (covers package) finds the art
+    cover_status = Column(String, nullable=False, default="resolved", server_default="resolved")  # pending, resolved or missing
+    cover_attempts = Column(Integer, nullable=False, default=0, server_default="0")  # failed lookups so far
+    cover_retry_at = Column(DateTime(timezone=True), nullable=True)  # when the next lookup of a pending cover is due
+    metadata_checked_at = Column(DateTime(timezone=True), nullable=True)  # when description and runtime were looked up
+    # search_vector (tsvector over title + artist) is generated by the database, see migrations/0005
 
 
 class TrendingAlbum(Base):
     __tablename__ = "trending_albums"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     album_id = Column(UUID(as_uuid=True), ForeignKey("albums.id"), nullable=False)
-    rank = Column(Integer, nullable=False)
+    rank = Column(Integer, nullable=False, index=True)
     week_start = Column(Date, nullable=True)
 
 # Each row in TrendingAlbum refers to one row in Album through the album_id foreign key
@@ -46,7 +54,7 @@ class User(Base):
 class Review(Base): 
     __tablename__ = "reviews"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    album_id = Column(UUID(as_uuid=True), ForeignKey("albums.id"), nullable=False)
+    album_id = Column(UUID(as_uuid=True), ForeignKey("albums.id"), nullable=False, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     rating = Column(Integer, nullable = True) #1-10 rating for the album
     review_text = Column(String, nullable=True)  # Text of the review
@@ -62,10 +70,31 @@ class Rating(Base):
     created_at = Column(Date, default=date.today, nullable=False)  # Date when the rating was created
     updated_at = Column(Date, nullable=True)  # Date when the rating was last updated
 
+    # one rating per user per album; its index also serves per-album lookups (leading column)
+    __table_args__ = (UniqueConstraint('album_id', 'user_id', name='uq_ratings_album_id_user_id'),)
+
+class AlbumStats(Base):
+    # running rating aggregates per album, kept in step with ratings on every write
+    __tablename__ = "album_stats"
+    album_id = Column(UUID(as_uuid=True), ForeignKey("albums.id"), primary_key=True)
+    rating_count = Column(Integer, default=0, nullable=False)
+    rating_sum = Column(Integer, default=0, nullable=False)
+    # histogram of how many ratings landed on each value 1-10
+    histogram_1 = Column(Integer, default=0, nullable=False)
+    histogram_2 = Column(Integer, default=0, nullable=False)
+    histogram_3 = Column(Integer, default=0, nullable=False)
+    histogram_4 = Column(Integer, default=0, nullable=False)
+    histogram_5 = Column(Integer, default=0, nullable=False)
+    histogram_6 = Column(Integer, default=0, nullable=False)
+    histogram_7 = Column(Integer, default=0, nullable=False)
+    histogram_8 = Column(Integer, default=0, nullable=False)
+    histogram_9 = Column(Integer, default=0, nullable=False)
+    histogram_10 = Column(Integer, default=0, nullable=False)
+
 class List(Base):
     __tablename__ = "lists"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     title = Column(String, nullable=False)  
     description = Column(String, nullable=True)  # optional description
     is_public = Column(Boolean, default=True)  # oublic or private list
@@ -83,4 +112,32 @@ class ListItem(Base):
     added_at = Column(Date, default=date.today)
 
     # Ensure unique album per list (can't add same album twice to one list)
-    __table_args__ = (UniqueConstraint('list_id', 'album_id'),)
\ No newline at end of file
+    __table_args__ = (UniqueConstraint('list_id', 'album_id'),)
+
+class ImportRun(Base):
+    # one run of an offline importer, kept so an interrupted run can be resumed
+    __tablename__ = "import_runs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    importer = Column(String, nullable=False)  # which script, e.g. "popularity"
+    mode = Column(String, nullable=False, default="full", server_default="full")  # full or incremental
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)  # null while running or after a crash
+    imported_count = Column(Integer, default=0, nullable=False)
+    rejected_count = Column(Integer, default=0, nullable=False)
+
+class ImportCheckpoint(Base):
+    # a search query whose releases are all committed (or rejected), written in the same
+    # transaction as the batch that finished it
+    __tablename__ = "import_checkpoints"
+    run_id = Column(UUID(as_uuid=True), ForeignKey("import_runs.id", ondelete="CASCADE"), primary_key=True)
+    query = Column(String, primary_key=True)
+    completed_at = Column(DateTime(timezone=True), nullable=False)
+
+class ImportSyncState(Base):
+    # per query family (year, genre, label, country) of an importer: newest release date seen
+    # and when the family was last searched in full, so incremental runs only ask for newer releases
+    __tablename__ = "import_sync_state"
+    importer = Column(String, primary_key=True)
+    family = Column(String, primary_key=True)
+    high_water_date = Column(Date, nullable=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,32 @@
+# counts the sql statements run while handling an api request, for benchmarks and profiling
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from .database import engine
+
+# the counter is a one-item list so threadpool endpoints, which run in a copy of the request's
+# context, add to the same count the middleware reads
+_counter: ContextVar[list | None] = ContextVar("db_query_counter", default=None)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+@contextmanager
+def counting_queries():
+    """
+    Count the statements executed inside the block, including work it hands to other threads.
+    Yields the one-item counter: with counting_queries() as count: ... then read count[0].
+    """
+    counter = [0]
+    token = _counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _counter.reset(token)
@@ -0,0 +1,46 @@
+# full-text and trigram matching for album and user search
+# relies on the search_vector column and pg_trgm indexes from migration 0005
+from sqlalchemy import func, literal_column, or_
+
+from .models import Album, User
+
+# generated column that only exists in the database, see migration 0005
+album_search_vector = literal_column("albums.search_vector")
+
+
+def _tsquery(term: str):
+    return func.plainto_tsquery("simple", term)
+
+
+def album_matches(term: str):
+    # whole-word hits through the tsvector, substring and typo-tolerant hits through trigrams
+    return or_(
+        album_search_vector.op("@@")(_tsquery(term)),
+        Album.title.ilike(f"%{term}%"),
+        Album.artist.ilike(f"%{term}%"),
+        Album.title.op("%")(term),
+        Album.artist.op("%")(term)
+    )
+
+
+def album_relevance(term: str):
+    # ts_rank favours title words over artist words, similarity rewards close spellings
+    return func.ts_rank(album_search_vector, _tsquery(term)) + func.greatest(
+        func.similarity(Album.title, term),
+        func.similarity(Album.artist, term)
+    )
+
+
+def user_matches(term: str):
+    return or_(
+        User.username.ilike(f"%{term}%"),
+        User.email.ilike(f"%{term}%"),
+        User.username.op("%")(term)
+    )
+
+
+def user_relevance(term: str):
+    return func.greatest(
+        func.similarity(User.username, term),
+        func.similarity(User.email, term)
+    )
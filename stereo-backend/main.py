@@ -1,12 +1,30 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from database.database import engine
-from database import models
-from api.endpoints import albums, trending, users, reviews, ratings, search, lists
+from database.database import LocalSession
+from database.query_count import counting_queries
+from autocomplete import suggestion_index
+from covers import cover_resolver
+from musicbrainz.budget import latency_budget
+from api.endpoints import albums, trending, users, reviews, ratings, search, lists, metrics
 
-models.Base.metadata.create_all(bind=engine) #bind=engine connects the metadata to the database engine
+# schema is managed by migrations (python scripts/migrate.py upgrade), not at import
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # loads the autocomplete index once per worker before serving requests
+    db = LocalSession()
+    try:
+        suggestion_index.build(db)
+    finally:
+        db.close()
+    # picks up covers left pending by earlier runs and the import scripts
+    cover_resolver.start()
+    yield
+    cover_resolver.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # enable cors for frontend
 app.add_middleware(
@@ -17,10 +35,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# seconds a request may spend waiting on musicbrainz / cover art archive in total
+REQUEST_BUDGET = float(os.getenv("MUSICBRAINZ_REQUEST_BUDGET", "4"))
+
+@app.middleware("http")
+async def outbound_latency_budget(request: Request, call_next):
+    # outbound calls made while handling the request cap their timeouts to what's left
+    with latency_budget(REQUEST_BUDGET):
+        return await call_next(request)
+
+# benchmarks (scripts/benchmark_api.py) set this to get each request's sql statement count
+# back in the X-DB-Queries response header
+REPORT_DB_QUERIES = os.getenv("REPORT_DB_QUERIES", "") == "1"
+
+if REPORT_DB_QUERIES:
+    @app.middleware("http")
+    async def db_query_count(request: Request, call_next):
+        with counting_queries() as count:
+            response = await call_next(request)
+        response.headers["X-DB-Queries"] = str(count[0])
+        return response
+
 app.include_router(albums.router)
 app.include_router(trending.router)
 app.include_router(users.router)
 app.include_router(reviews.router)
 app.include_router(ratings.router)
 app.include_router(search.router)
-app.include_router(lists.router)
\ No newline at end of file
+app.include_router(lists.router)
+app.include_router(metrics.router)
\ No newline at end of file
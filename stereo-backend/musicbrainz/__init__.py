@@ -0,0 +1,243 @@
+"""
+Outbound MusicBrainz and Cover Art Archive calls shared by the api and the scripts.
+
+Every GET goes through the on-disk response cache (see cache.py) under a policy per
+endpoint: how long an answer is fresh, how long an expired answer may still be served
+while a background refresh runs (stale-while-revalidate), and how long a "not found"
+is remembered (negative caching, e.g. releases without cover art).
+
+Requests that do reach musicbrainz.org first take a token from the rate limiter shared
+with every other worker and script (see rate_limit.py). Api handlers call at
+INTERACTIVE priority, scripts and cache refreshes at BACKGROUND. The network calls
+themselves go through the pooled keep-alive client in client.py. 429/503 answers and
+failed connections are retried here rather than in the client, so every attempt takes
+its own rate limit token and fits in the caller's latency budget.
+
+Concurrent cache misses for the same resource are coalesced (see singleflight.py): one
+caller fetches, takes the rate limit token and fills the cache, the others share its answer.
+When the fetching caller's own latency budget cuts its call short, the others don't share
+that failure but fetch again with what is left of their budgets.
+
+Each host sits behind a circuit breaker (breaker.py) that fails calls fast after repeated
+errors or slow answers, and calls made while handling an api request are capped by that
+request's latency budget (budget.py). Only 5xx/429 answers, failed connections and timeouts
+the host had the full timeout for count as breaker failures; a timeout the budget shortened
+says nothing about the host. Cached answers, stale ones included, are served
+either way; only misses fail.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from dotenv import load_dotenv
+
+from . import budget
+from .breaker import CircuitBreaker, CircuitOpen
+from .cache import DEFAULT_PATH, ResponseCache
+from .client import http_client
+from .rate_limit import BACKGROUND, INTERACTIVE, RateLimitTimeout, SharedTokenBucket
+from .singleflight import SingleFlight
+
+load_dotenv()
+
+# overridable so benchmarks can point at a local stand-in (scripts/fake_musicbrainz.py)
+MUSICBRAINZ_URL = os.getenv("MUSICBRAINZ_URL", "https://musicbrainz.org/ws/2").rstrip("/")
+COVER_ART_URL = os.getenv("COVER_ART_URL", "https://coverartarchive.org").rstrip("/")
+PLACEHOLDER_COVER_URL = "https://via.placeholder.com/500x500?text=No+Cover+Art"
+
+DAY = 24 * 60 * 60
+RETRY_STATUSES = (429, 503)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: float
+    stale_ttl: float = 0
+    negative_ttl: float | None = None  # remember 404s this long, None to raise them uncached
+
+
+SEARCH_POLICY = CachePolicy(ttl=DAY, stale_ttl=7 * DAY)
+# incremental imports look for new releases, a search answer from hours ago is fine, a stale one isn't
+SYNC_POLICY = CachePolicy(ttl=6 * 60 * 60)
+RELEASE_POLICY = CachePolicy(ttl=30 * DAY, stale_ttl=180 * DAY)
+# coverartarchive answers 404 for releases that have no art
+COVER_ART_POLICY = CachePolicy(ttl=30 * DAY, stale_ttl=90 * DAY, negative_ttl=7 * DAY)
+
+cache = ResponseCache(
+    os.getenv("MUSICBRAINZ_CACHE_PATH", DEFAULT_PATH),
+    max_entries=int(os.getenv("MUSICBRAINZ_CACHE_MAX_ENTRIES", "100000"))
+)
+
+rate_limiter = SharedTokenBucket(
+    os.getenv("MUSICBRAINZ_RATE_LIMIT_PATH", os.path.join(os.path.dirname(DEFAULT_PATH), "musicbrainz-rate-limit")),
+    rate=float(os.getenv("MUSICBRAINZ_RATE_LIMIT", "1.0"))
+)
+
+inflight = SingleFlight()
+
+# keyed by host[:port], so two services on one host (like the local stand-in) get a breaker each
+breakers = {
+    urlsplit(url).netloc: CircuitBreaker(
+        urlsplit(url).netloc,
+        failure_threshold=int(os.getenv("MUSICBRAINZ_BREAKER_FAILURES", "5")),
+        slow_call=float(os.getenv("MUSICBRAINZ_BREAKER_SLOW_CALL", "3")),
+        reset_timeout=float(os.getenv("MUSICBRAINZ_BREAKER_RESET", "30")),
+    )
+    for url in (MUSICBRAINZ_URL, COVER_ART_URL)
+}
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def cache_key(url: str, params: dict | None = None) -> str:
+    return f"{url}?{urlencode(sorted(params.items()))}" if params else url
+
+
+def fetch_json(url: str, params: dict | None = None, policy: CachePolicy = SEARCH_POLICY, timeout: float = 10,
+               priority: int = INTERACTIVE):
+    """
+    GET a JSON resource through the cache.
+    Returns None for a 404 when the policy caches negatives; any other failure raises
+    requests.RequestException (including RateLimitTimeout, CircuitOpen and BudgetExhausted)
+    and is not cached.
+    """
+    key = cache_key(url, params)
+    entry = cache.get(key)
+    if entry is not None:
+        if not entry.is_fresh:
+            _refresh_in_background(key, url, params, policy, timeout)
+        return entry.data
+    return inflight.do(key, lambda: _fetch_and_store(key, url, params, policy, timeout, priority),
+                       _coalesced_wait(budget.clamp(timeout), priority), rejoin_on=(budget.BudgetExhausted,))
+
+
+def _coalesced_wait(timeout, priority):
+    # a caller joining a flight waits about as long as its own rate limit wait plus request could take
+    return 2 * timeout if priority == INTERACTIVE else None
+
+
+def _fetch_and_store(key, url, params, policy, timeout, priority=INTERACTIVE):
+    response = _get_with_retries(url, params, timeout, priority)
+    if response.status_code == 404 and policy.negative_ttl is not None:
+        cache.set(key, 404, None, policy.negative_ttl)
+        return None
+    response.raise_for_status()
+    data = response.json()
+    cache.set(key, response.status_code, data, policy.ttl, policy.stale_ttl)
+    return data
+
+
+def _get_with_retries(url, params, timeout, priority):
+    # hands back the last 429/503 once retries or the budget run out, so raise_for_status reports it
+    attempt = 0
+    while True:
+        failure = response = None
+        try:
+            response = _get(url, params, timeout, priority)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+        except requests.ConnectionError as e:
+            if isinstance(e, requests.Timeout):
+                raise  # the host may have the request, sending it again doesn't help
+            failure = e
+        delay = http_client.backoff(attempt, response)
+        left = budget.remaining()
+        if attempt >= http_client.max_retries or (left is not None and delay >= left):
+            if failure is not None:
+                raise failure
+            return response
+        time.sleep(delay)
+        attempt += 1
+
+
+def _get(url, params, timeout, priority):
+    # one attempt: breaker check, a rate limit token for musicbrainz.org, then the request
+    breaker = breakers.get(urlsplit(url).netloc)
+    if breaker is not None:
+        breaker.allow()
+    if url.startswith(MUSICBRAINZ_URL):
+        # interactive callers give up rather than queue longer than they'd wait on the network
+        rate_limiter.acquire(priority, max_wait=budget.clamp(timeout) if priority == INTERACTIVE else None)
+    clamped = budget.clamp(timeout)
+    start = time.monotonic()
+    try:
+        response = http_client.get(url, params=params, timeout=clamped)
+    except requests.RequestException as e:
+        cut_short = isinstance(e, requests.Timeout) and timeout is not None and clamped < timeout
+        if breaker is not None:
+            # only refused connections and timeouts the host had its full time for count against it
+            if isinstance(e, (requests.ConnectionError, requests.Timeout)) and not cut_short:
+                breaker.record(time.monotonic() - start, failed=True)
+            else:
+                breaker.release()
+        if cut_short:
+            # cut short by this caller's budget, not the host's fault (and not its coalesced callers')
+            raise budget.BudgetExhausted(f"Request latency budget ran out waiting for {url}") from e
+        raise
+    if breaker is not None:
+        breaker.record(time.monotonic() - start, failed=response.status_code >= 500 or response.status_code == 429)
+    return response
+
+
+def _refresh_in_background(key, url, params, policy, timeout):
+    # one refresh per key per process; the stale copy keeps being served meanwhile
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            inflight.do(key, lambda: _fetch_and_store(key, url, params, policy, timeout, BACKGROUND))
+        except requests.RequestException as e:
+            print(f"MusicBrainz cache refresh failed for {url}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_pool.submit(refresh)
+
+
+def search_releases(query: str, limit: int = 10, inc: str | None = None, timeout: float = 10,
+                    priority: int = INTERACTIVE, policy: CachePolicy = SEARCH_POLICY) -> list:
+    params = {"query": query, "fmt": "json", "limit": limit}
+    if inc:
+        params["inc"] = inc
+    data = fetch_json(f"{MUSICBRAINZ_URL}/release", params, policy, timeout, priority)
+    return data.get("releases", [])
+
+
+def get_release(mbid: str, inc: str | None = None, timeout: float = 10, priority: int = INTERACTIVE) -> dict:
+    params = {"fmt": "json"}
+    if inc:
+        params["inc"] = inc
+    return fetch_json(f"{MUSICBRAINZ_URL}/release/{mbid}", params, RELEASE_POLICY, timeout, priority)
+
+
+def fetch_cover_art_url(mbid: str, timeout: float = 5, priority: int = INTERACTIVE) -> str | None:
+    """
+    Front cover if there is one, else the first image, else None when the release has no art.
+    Lookup failures raise requests.RequestException so callers can retry them.
+    """
+    data = fetch_json(f"{COVER_ART_URL}/release/{mbid}", None, COVER_ART_POLICY, timeout, priority)
+    images = (data or {}).get("images", [])
+    for image in images:
+        if image.get("front", False):
+            return image["image"]
+    if images:
+        return images[0]["image"]
+    return None
+
+
+def get_cover_art_url(mbid: str, timeout: float = 5) -> str:
+    # same lookup, but any failure or missing art gives the placeholder
+    try:
+        return fetch_cover_art_url(mbid, timeout) or PLACEHOLDER_COVER_URL
+    except Exception:
+        return PLACEHOLDER_COVER_URL
@@ -0,0 +1,82 @@
+"""
+Circuit breaker for outbound hosts.
+
+Each host gets a breaker that opens after FAILURE_THRESHOLD consecutive failures, where
+a response slower than slow_call counts as a failure too. While open, calls fail at once
+with CircuitOpen instead of tying up a worker until the timeout. After reset_timeout one
+trial call is let through (half-open): success closes the breaker, failure opens it again.
+"""
+import threading
+import time
+
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(requests.RequestException):
+    """The host's breaker is open, the call was not attempted."""
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, failure_threshold: int = 5, slow_call: float = 3.0, reset_timeout: float = 30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._trial_started = None  # when the half-open trial call was let through
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go out now."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return
+            # a trial that never reported back (e.g. it gave up before sending) is replaced
+            now = time.monotonic()
+            if self.state == HALF_OPEN and (self._trial_started is None or now - self._trial_started >= self.reset_timeout):
+                self._trial_started = now
+                return
+            self.rejected += 1
+        raise CircuitOpen(f"Circuit breaker for {self.host} is open")
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record(self, seconds: float, failed: bool):
+        with self._lock:
+            self._trial_started = None
+            if failed or seconds > self.slow_call:
+                self.failures += 1
+                if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                    if self.state != OPEN:
+                        self.times_opened += 1
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+            else:
+                self.failures = 0
+                self.state = CLOSED
+
+    def release(self):
+        """Report a call that ended without telling anything about the host, e.g. cut short by the caller."""
+        with self._lock:
+            self._trial_started = None  # a half-open trial is up for grabs again
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected,
+            }
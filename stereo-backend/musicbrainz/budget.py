@@ -0,0 +1,49 @@
+"""
+Per-request latency budget.
+
+A request handler (or the middleware in main.py) opens a budget with latency_budget();
+it is kept in a context variable, so every outbound call made for that request, in the
+handler's thread or in pools submitted to with contextvars.copy_context(), caps its
+timeouts to what is left. Once the budget is spent, calls fail with BudgetExhausted
+instead of going out, as do calls whose shortened timeout runs out. Code running
+outside any budget (scripts, background workers) keeps its own timeouts.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import requests
+
+_deadline: ContextVar[float | None] = ContextVar("musicbrainz_deadline", default=None)
+
+
+class BudgetExhausted(requests.Timeout):
+    """The request's latency budget ran out before the call could be made, or cut it short."""
+
+
+@contextmanager
+def latency_budget(seconds: float):
+    # nested budgets never extend an outer one
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left in the current budget, None outside of one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clamp(timeout: float | None) -> float | None:
+    """The timeout to use for a call now, raising BudgetExhausted when nothing is left."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise BudgetExhausted("Request latency budget exhausted")
+    return left if timeout is None else min(timeout, left)
@@ -0,0 +1,119 @@
+"""
+On-disk cache for MusicBrainz and Cover Art Archive responses.
+
+A single SQLite file shared by the api workers and the import scripts. SQLite's WAL
+mode lets several processes read while one writes, and each thread keeps its own
+connection. Entries are evicted least-recently-used once the table grows past
+max_entries.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "musicbrainz.sqlite3")
+# evict after every this many writes rather than on each one
+EVICT_EVERY = 100
+
+
+@dataclass
+class CacheEntry:
+    status: int
+    data: dict | None  # None for negative entries (e.g. no cover art)
+    expires_at: float
+    stale_until: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def is_usable(self) -> bool:
+        # past expiry but still inside the stale-while-revalidate window
+        return time.time() < self.stale_until
+
+
+class ResponseCache:
+    def __init__(self, path: str = DEFAULT_PATH, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    body TEXT,
+                    expires_at REAL NOT NULL,
+                    stale_until REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> CacheEntry | None:
+        # returns the entry (fresh or stale) and marks it recently used, None if absent or too old
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT status, body, expires_at, stale_until FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            status, body, expires_at, stale_until = row
+            entry = CacheEntry(status, json.loads(body) if body is not None else None, expires_at, stale_until)
+            if not entry.is_usable:
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return entry
+        except sqlite3.Error as e:
+            # a busy or broken cache file degrades to a miss instead of failing the request
+            print(f"Response cache read failed: {e}")
+            return None
+
+    def set(self, key: str, status: int, data: dict | None, ttl: float, stale_ttl: float = 0):
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO responses (key, status, body, expires_at, stale_until, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(data) if data is not None else None, now + ttl, now + ttl + stale_ttl, now)
+            )
+        except sqlite3.Error as e:
+            print(f"Response cache write failed: {e}")
+            return
+        with self._writes_lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        # drops expired entries, then the least recently used ones beyond max_entries
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses WHERE stale_until < ?", (time.time(),))
+            (count,) = conn.execute("SELECT count(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            # runs inside whichever request made the write, so like get/set it never fails that request
+            print(f"Response cache eviction failed: {e}")
@@ -0,0 +1,121 @@
+"""
+Pooled outbound HTTP client.
+
+One requests.Session per host, each with a keep-alive connection pool, so repeated
+calls to musicbrainz.org and coverartarchive.org reuse open TCP/TLS connections instead
+of opening a new one per request. Sessions carry the User-Agent header MusicBrainz
+requires and never retry on their own: a retry inside the session would skip the shared
+rate limiter and the caller's latency budget, so callers retry (see backoff()) instead.
+
+Per host the client records requests, errors, new connections opened (to derive the
+connection reuse rate) and recent latencies; metrics() returns a snapshot.
+"""
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"
+LATENCY_SAMPLES = 1000
+
+
+class HostMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, failed: bool):
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+            self.latencies.append(seconds)
+
+    def snapshot(self, pools) -> dict:
+        # urllib3 counts connections opened and requests sent (retries included) per pool
+        sent = sum(pool.num_requests for pool in pools)
+        opened = sum(pool.num_connections for pool in pools)
+        with self._lock:
+            latencies = sorted(self.latencies)
+        pick = lambda fraction: round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 1)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": opened,
+            "connection_reuse_rate": round(1 - opened / sent, 3) if sent else None,
+            "latency_ms": {
+                "p50": pick(0.5),
+                "p95": pick(0.95),
+                "mean": round(statistics.mean(latencies) * 1000, 1),
+            } if latencies else None,
+        }
+
+
+class HttpClient:
+    def __init__(self, pool_maxsize: int = 16, max_retries: int = 3, backoff_factor: float = 0.5):
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._sessions = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _session(self, host: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session = requests.Session()
+                session.headers["User-Agent"] = USER_AGENT
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+                self._metrics[host] = HostMetrics()
+            return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc
+        session = self._session(host)
+        metrics = self._metrics[host]
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = session.get(url, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            metrics.record(time.perf_counter() - start, failed)
+
+    def backoff(self, attempt: int, response: requests.Response | None = None) -> float:
+        """
+        Seconds to wait before retry number attempt + 1: the response's Retry-After when
+        it gives one in seconds, else exponential backoff.
+        """
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        return self.backoff_factor * 2 ** attempt
+
+    def metrics(self) -> dict:
+        with self._lock:
+            sessions = dict(self._sessions)
+        snapshot = {}
+        for host, session in sessions.items():
+            pools = []
+            for adapter in set(session.adapters.values()):
+                pool_manager = adapter.poolmanager
+                pools.extend(pool_manager.pools[key] for key in pool_manager.pools.keys())
+            snapshot[host] = self._metrics[host].snapshot(pools)
+        return snapshot
+
+
+http_client = HttpClient(
+    pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "16")),
+    max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3"))
+)
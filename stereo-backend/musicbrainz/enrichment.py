@@ -0,0 +1,78 @@
+"""
+Album details beyond what a search result carries: description, runtime and cover.
+
+A single release lookup with inc=annotation+recordings answers both the annotation
+(description) and the track lengths (runtime); artist-credits rides along so the same
+response also has everything needed to create the album. Cover lookups go to the Cover
+Art Archive, which isn't behind the musicbrainz rate limit, so enrich_releases runs
+them concurrently with the (rate limited) release lookups.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from . import INTERACTIVE, BACKGROUND, PLACEHOLDER_COVER_URL, fetch_cover_art_url, get_release
+
+DETAILS_INC = "annotation+recordings+artist-credits"
+
+
+@dataclass(frozen=True)
+class ReleaseDetails:
+    release: dict
+    description: str | None
+    runtime_minutes: int | None
+    cover_url: str = PLACEHOLDER_COVER_URL
+    cover_missing: bool = False  # the cover art archive has no art for the release (not just a failed lookup)
+
+
+def release_runtime_minutes(release: dict) -> int | None:
+    # total length of the release's tracks, None when musicbrainz has no lengths
+    lengths = [
+        track["recording"]["length"]
+        for medium in release.get("media", [])
+        for track in medium.get("tracks", [])
+        if (track.get("recording") or {}).get("length")
+    ]
+    return sum(lengths) // 60000 if lengths else None
+
+
+def get_release_details(mbid: str, timeout: float = 10, priority: int = INTERACTIVE) -> ReleaseDetails:
+    # one lookup for the release and its description and runtime, the cover is left to the caller
+    release = get_release(mbid, inc=DETAILS_INC, timeout=timeout, priority=priority)
+    return ReleaseDetails(
+        release=release,
+        description=release.get("annotation") or None,
+        runtime_minutes=release_runtime_minutes(release),
+    )
+
+
+def _cover(mbid: str) -> tuple[str, bool]:
+    # (cover url, whether the release has no art); a failed lookup gives the placeholder
+    try:
+        cover_url = fetch_cover_art_url(mbid)
+    except Exception:
+        return PLACEHOLDER_COVER_URL, False
+    return (cover_url, False) if cover_url else (PLACEHOLDER_COVER_URL, True)
+
+
+def enrich_releases(mbids: list, workers: int = 8, priority: int = BACKGROUND, cover_mbids=None) -> dict:
+    """
+    Details and cover for every mbid, looked up concurrently: mbid -> ReleaseDetails.
+    Only the covers of cover_mbids are looked up when it is given, the rest keep the placeholder.
+    A failed release lookup leaves release, description and runtime empty, a failed cover the placeholder.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich") as pool:
+        details = {mbid: pool.submit(get_release_details, mbid, priority=priority) for mbid in mbids}
+        covers = {
+            mbid: pool.submit(_cover, mbid)
+            for mbid in (mbids if cover_mbids is None else cover_mbids)
+        }
+        enriched = {}
+        for mbid in mbids:
+            try:
+                found = details[mbid].result()
+            except Exception:
+                found = ReleaseDetails(release={}, description=None, runtime_minutes=None)
+            cover_url, cover_missing = covers[mbid].result() if mbid in covers else (PLACEHOLDER_COVER_URL, False)
+            enriched[mbid] = ReleaseDetails(found.release, found.description, found.runtime_minutes,
+                                            cover_url, cover_missing)
+        return enriched
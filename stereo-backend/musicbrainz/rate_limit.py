@@ -0,0 +1,77 @@
+"""
+Token bucket shared by every process that calls musicbrainz.org.
+
+MusicBrainz allows about one request per second per client, and the api workers and
+the import scripts all count against that same budget. The bucket state (tokens left,
+time of last update) lives in a 16-byte file that callers update under an exclusive
+flock, so uvicorn workers, threads and scripts all draw from one bucket.
+
+Priorities work by reserve: a background caller only takes a token when that still
+leaves `background_reserve` tokens in the bucket, so an interactive search arriving
+during an import finds a token waiting instead of queueing behind it. Callers that
+find the bucket short sleep until enough tokens should have refilled and retry.
+"""
+import fcntl
+import os
+import random
+import struct
+import time
+
+import requests
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_STATE = struct.Struct("dd")  # tokens, updated_at
+
+
+class RateLimitTimeout(requests.RequestException):
+    # raised when a caller would wait past its deadline for a token; handled like any failed request
+    pass
+
+
+class SharedTokenBucket:
+    def __init__(self, path: str, rate: float = 1.0, capacity: float = 2.0, background_reserve: float = 1.0):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity
+        self.background_reserve = background_reserve
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _take(self, need: float) -> float:
+        # takes one token if at least `need` are available; returns 0, or seconds until there should be
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            raw = os.pread(fd, _STATE.size, 0)
+            if len(raw) == _STATE.size:
+                tokens, updated_at = _STATE.unpack(raw)
+                tokens = min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+            else:
+                tokens = self.capacity
+            wait = 0.0
+            if tokens >= need:
+                tokens -= 1
+            else:
+                wait = (need - tokens) / self.rate
+            os.pwrite(fd, _STATE.pack(tokens, now), 0)
+            return wait
+        finally:
+            os.close(fd)  # also releases the lock
+
+    def acquire(self, priority: int = INTERACTIVE, max_wait: float | None = None):
+        """
+        Block until a request may be sent.
+        Raises RateLimitTimeout instead of waiting longer than max_wait seconds.
+        """
+        need = 1 + (self.background_reserve if priority == BACKGROUND else 0)
+        deadline = time.time() + max_wait if max_wait is not None else None
+        while True:
+            wait = self._take(need)
+            if wait == 0:
+                return
+            if deadline is not None and time.time() + wait > deadline:
+                raise RateLimitTimeout(f"MusicBrainz rate limit: no request slot within {max_wait}s")
+            # jitter so waiters woken together don't all hit the lock at once
+            time.sleep(wait + random.uniform(0, 0.05))
@@ -0,0 +1,81 @@
+"""
+Request coalescing for outbound fetches.
+
+Concurrent callers asking for the same key share one in-flight call: the first caller
+(the leader) runs it, everyone arriving before it finishes waits for the leader's
+result or exception instead of making an identical request. Nothing is remembered once
+the call is done; the response cache handles reuse after that.
+
+A leader's failure is shared with its joiners, except for the exception types a caller
+passes as rejoin_on: those are the leader's own doing (its latency budget ran out), so
+joiners go round again and join a newer flight or lead one themselves.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FuturesTimeout
+from urllib.parse import urlsplit
+
+import requests
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {}  # host -> [calls, coalesced]
+
+    def _join(self, key: str):
+        # returns (future, True) for the leader, (future, False) for a caller joining a flight
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            stats = self._stats.setdefault(urlsplit(key).hostname or "", [0, 0])
+            stats[0] += 1
+            stats[1] += not leader
+            return flight, leader
+
+    def _land(self, key: str, flight: Future, fn):
+        try:
+            result, error = fn(), None
+        except BaseException as e:
+            result, error = None, e
+        # the flight is gone before joiners wake, so a joiner going round again can't rejoin it
+        with self._lock:
+            del self._flights[key]
+        if error is None:
+            flight.set_result(result)
+        else:
+            flight.set_exception(error)
+
+    def do(self, key: str, fn, wait: float | None = None, rejoin_on: tuple = ()):
+        """
+        Run fn() unless a call for key is already in flight, then wait for that one instead.
+        Callers that join a flight give up after wait seconds in all with requests.Timeout.
+        A joiner whose leader raised one of rejoin_on tries again instead of raising it.
+        """
+        deadline = None if wait is None else time.monotonic() + wait
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                self._land(key, flight, fn)
+            try:
+                return flight.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except FuturesTimeout:
+                raise requests.Timeout(f"Timed out waiting for in-flight request to {key}")
+            except rejoin_on:
+                if leader:
+                    raise
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                host: {
+                    "calls": calls,
+                    "coalesced": coalesced,
+                    "coalesced_rate": round(coalesced / calls, 3) if calls else None,
+                }
+                for host, (calls, coalesced) in self._stats.items()
+            }
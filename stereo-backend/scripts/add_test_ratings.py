@@ -10,6 +10,7 @@ import uuid
 import random
 from database.database import get_db
 from database.models import Album, Rating, User
+from database.album_stats import apply_rating_change
 
 def add_test_ratings():
     """add random test ratings to existing albums"""
@@ -62,6 +63,7 @@ def add_test_ratings():
                     rating=rating_value
                 )
                 db.add(rating)
+                apply_rating_change(db, album.id, new_rating=rating_value)
             
             db.commit()
             print(f"📊 added {num_ratings} ratings to: {album.title}")
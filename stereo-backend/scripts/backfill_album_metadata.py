@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+fills in description, runtime and cover for albums that have a musicbrainz id but are missing them
+(albums added from search or by import_albums.py only get title, artist and date)
+albums are walked in id order with keyset pagination; each page is enriched concurrently, with the
+musicbrainz lookups paced by the shared rate limiter at background priority, and written back with
+one UPDATE ... FROM (VALUES ...) per page
+every album whose release lookup worked gets metadata_checked_at, so one musicbrainz has no
+annotation or track lengths for keeps its NULLs and isn't fetched again; covers are only looked
+up for placeholder albums marked resolved (pending ones belong to the api's background resolver,
+missing ones have no art): found covers are stored, releases without art become missing and
+failed lookups pending, for the resolver to retry
+usage: python scripts/backfill_album_metadata.py [--page 100] [--workers 8] [--limit N]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import time
+
+from sqlalchemy import Integer, String, and_, column, func, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+
+from database.database import LocalSession, engine
+from database.models import Album
+from database import migrations
+from covers import MISSING, PENDING, RESOLVED
+from musicbrainz import PLACEHOLDER_COVER_URL
+from musicbrainz.enrichment import enrich_releases
+
+REPORT_EVERY = 10  # seconds between progress lines
+
+NEEDS_COVER = and_(Album.cover_url == PLACEHOLDER_COVER_URL, Album.cover_status == RESOLVED)
+INCOMPLETE = and_(
+    Album.musicbrainz_id.is_not(None),
+    Album.metadata_checked_at.is_(None),
+    or_(Album.description.is_(None), Album.runtime_minutes.is_(None), NEEDS_COVER),
+)
+
+def count_incomplete(db):
+    return db.scalar(select(func.count()).select_from(Album).where(INCOMPLETE))
+
+def incomplete_page(db, after, size):
+    # keyset pagination on the primary key: each page starts where the last one ended
+    query = select(Album.id, Album.musicbrainz_id, NEEDS_COVER).where(INCOMPLETE).order_by(Album.id).limit(size)
+    if after is not None:
+        query = query.where(Album.id > after)
+    return db.execute(query).all()
+
+def enrich_page(page, workers):
+    # one row per album whose lookup worked: (id, description, runtime_minutes, cover_url, cover_status),
+    # the cover columns None when the album's cover is left as it is
+    details = enrich_releases(
+        [mbid for _, mbid, _ in page],
+        workers=workers,
+        cover_mbids={mbid for _, mbid, needs_cover in page if needs_cover},
+    )
+    rows = []
+    for album_id, mbid, needs_cover in page:
+        found = details[mbid]
+        if not found.release:
+            continue  # lookup failed, the next run tries again
+        cover_url = cover_status = None
+        if needs_cover and found.cover_url != PLACEHOLDER_COVER_URL:
+            cover_url, cover_status = found.cover_url, RESOLVED
+        elif needs_cover:
+            cover_status = MISSING if found.cover_missing else PENDING
+        rows.append((album_id, found.description, found.runtime_minutes, cover_url, cover_status))
+    return rows
+
+def write_page(db, rows):
+    # UPDATE albums SET ... FROM (VALUES ...) AS found WHERE albums.id = found.id
+    found = values(
+        column("id", UUID(as_uuid=True)),
+        column("description", String),
+        column("runtime_minutes", Integer),
+        column("cover_url", String),
+        column("cover_status", String),
+        name="found",
+    ).data(rows)
+    db.execute(
+        update(Album)
+        .where(Album.id == found.c.id)
+        .values(
+            description=func.coalesce(Album.description, found.c.description),
+            runtime_minutes=func.coalesce(Album.runtime_minutes, found.c.runtime_minutes),
+            cover_url=func.coalesce(found.c.cover_url, Album.cover_url),
+            cover_status=func.coalesce(found.c.cover_status, Album.cover_status),
+            metadata_checked_at=func.now(),
+        )
+    )
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="backfill description, runtime and cover of albums from musicbrainz")
+    parser.add_argument("--page", type=int, default=100, help="albums enriched and written per round")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent lookups per page")
+    parser.add_argument("--limit", type=int, help="stop after this many albums")
+    args = parser.parse_args()
+
+    if migrations.current(engine) < migrations.head():
+        sys.exit("❌ database schema is out of date, run scripts/migrate.py upgrade first")
+    db = LocalSession()
+    try:
+        total = count_incomplete(db)
+        if args.limit is not None:
+            total = min(total, args.limit)
+        print(f"🔍 {total:,} albums missing description, runtime or cover")
+
+        started = last_report = time.monotonic()
+        after = None
+        processed = updated = 0
+        while processed < total:
+            page = incomplete_page(db, after, min(args.page, total - processed))
+            if not page:
+                break
+            after = page[-1].id
+            rows = enrich_page(page, args.workers)
+            if rows:
+                write_page(db, rows)
+            processed += len(page)
+            updated += len(rows)
+
+            now = time.monotonic()
+            if now - last_report >= REPORT_EVERY or processed >= total:
+                last_report = now
+                rate = processed / (now - started)
+                eta = (total - processed) / rate if rate else 0
+                print(f"📀 {processed:,}/{total:,} albums ({updated:,} updated), "
+                      f"{rate:.1f} albums/s, ~{eta / 60:.0f} min left")
+
+        print(f"\n🎉 Backfilled {updated:,} of {processed:,} albums in {time.monotonic() - started:.0f}s")
+    except Exception as e:
+        print(f"❌ error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+load-tests the api with scripted traffic and writes the results as json for comparing commits
+starts main:app under uvicorn against a local postgres database seeded by generate_test_data.py
+to a fixed size (postgres only: the schema relies on tsvector, pg_trgm and on conflict upserts,
+which sqlite can't run), then replays a weighted mix of user journeys from --concurrency clients:
+  homepage       trending albums, trending searches, a user's lists
+  search_typing  suggestions for every prefix typed into the search box, then the full search
+  album_page     album details, reviews and average rating, mostly of popular albums
+  rating_burst   a run of ratings on one of the hottest albums (the ratings and album_stats rows it
+                 can touch are put back after the run, so every run starts from the same database)
+reports p50/p95/p99 latency, throughput and sql statements per request (X-DB-Queries header,
+see REPORT_DB_QUERIES in main.py) per endpoint; journeys and their parameters come from --seed,
+so two runs send the same traffic
+usage: python scripts/benchmark_api.py --database-url postgresql://... [--size small]
+       [--mix homepage=2,search_typing=3,album_page=4,rating_burst=1] [--duration 30]
+       [--concurrency 8] [--out results.json] [--compare baseline.json]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import json
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import requests
+from sqlalchemy import create_engine, text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_SEED = 1  # generate_test_data.py seed, fixed so every run benchmarks the same database
+PRESETS = {
+    "small": {"albums": 10_000, "users": 2_000, "ratings": 200_000, "reviews": 20_000, "lists": 1_000},
+    "medium": {"albums": 100_000, "users": 20_000, "ratings": 2_000_000, "reviews": 200_000, "lists": 10_000},
+    "large": {"albums": 1_000_000, "users": 500_000, "ratings": 50_000_000, "reviews": 2_000_000, "lists": 100_000},
+}
+DEFAULT_MIX = "homepage=2,search_typing=3,album_page=4,rating_burst=1"
+STARTUP_TIMEOUT = 300  # seconds, the suggestion index is built before the first request is served
+BURST_ALBUMS = 10  # rating_burst rates one of this many hottest albums
+# copies of the rows rating_burst can change, kept until the run is over
+SNAPSHOT_STATS, SNAPSHOT_USERS, SNAPSHOT_RATINGS = ("benchmark_snapshot_stats", "benchmark_snapshot_users",
+                                                    "benchmark_snapshot_ratings")
+
+
+# journeys: each yields (method, endpoint, path, params); endpoint is the route, results group by it
+
+def homepage(fixtures, rng):
+    yield "GET", "/trending/albums", "/trending/albums", None
+    yield "GET", "/search/trending-searches", "/search/trending-searches", None
+    yield "GET", "/lists/user/{user_id}", f"/lists/user/{rng.choice(fixtures['users'])}", None
+
+def search_typing(fixtures, rng):
+    query = rng.choice(fixtures["titles"]).lower()
+    for typed in range(1, min(len(query), 8) + 1):
+        yield "GET", "/search/suggestions", "/search/suggestions", {"q": query[:typed]}
+    yield "GET", "/search/", "/search/", {"q": query}
+
+def album_page(fixtures, rng):
+    album_id = rng.choice(fixtures["popular_albums"] if rng.random() < 0.8 else fixtures["albums"])
+    yield "GET", "/albums/{album_id}", f"/albums/{album_id}", None
+    yield "GET", "/albums/{album_id}/reviews", f"/albums/{album_id}/reviews", None
+    yield "GET", "/albums/{album_id}/average-rating", f"/albums/{album_id}/average-rating", None
+
+def rating_burst(fixtures, rng):
+    album_id = rng.choice(fixtures["popular_albums"][:BURST_ALBUMS])
+    for user_id in rng.sample(fixtures["users"], 10):
+        yield ("POST", "/ratings/albums/{album_id}/rate", f"/ratings/albums/{album_id}/rate",
+               {"rating_value": rng.randint(1, 10), "user_id": user_id})
+
+JOURNEYS = {journey.__name__: journey for journey in (homepage, search_typing, album_page, rating_burst)}
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in JOURNEYS:
+            raise ValueError(f"Unknown journey {name!r}, pick from {', '.join(JOURNEYS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def seed_database(database_url, size):
+    # loads the preset once; a database already holding the seed at another size can't be reused
+    preset = PRESETS[size]
+    # the benchmark database is the harness's own, so it brings the schema to head itself
+    subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "scripts", "migrate.py"), "upgrade"],
+                   cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": database_url}, check=True)
+    command = [sys.executable, os.path.join(BACKEND_DIR, "scripts", "generate_test_data.py"), "--seed", str(DATA_SEED)]
+    for option, value in preset.items():
+        command += [f"--{option}", str(value)]
+    subprocess.run(command, cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": database_url}, check=True)
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        albums = conn.execute(text("SELECT count(*) FROM albums WHERE id::text LIKE :prefix"),
+                              {"prefix": f"5eed0a1b-{DATA_SEED:04x}-%"}).scalar()  # generated album ids
+    engine.dispose()
+    if albums != preset["albums"]:
+        raise RuntimeError(f"Database holds {albums:,} generated albums, not the {preset['albums']:,} of --size {size}; "
+                           f"use a fresh database")
+
+def load_fixtures(database_url):
+    # ids and titles the journeys pick from, in a fixed order so the seed reproduces the traffic
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        popular = conn.execute(text(
+            "SELECT s.album_id, a.title FROM album_stats s JOIN albums a ON a.id = s.album_id "
+            "ORDER BY s.rating_count DESC, s.album_id LIMIT 500"
+        )).all()
+        fixtures = {
+            "popular_albums": [str(album_id) for album_id, _ in popular],
+            "titles": [title for _, title in popular],
+            "albums": [str(album_id) for album_id in conn.execute(text("SELECT id FROM albums ORDER BY id LIMIT 5000")).scalars()],
+            "users": [str(user_id) for user_id in conn.execute(text("SELECT id FROM users ORDER BY id LIMIT 2000")).scalars()],
+        }
+    engine.dispose()
+    if not fixtures["popular_albums"] or len(fixtures["users"]) < 10:
+        raise RuntimeError("Database has no rated albums or too few users to benchmark, seed it first")
+    return fixtures
+
+def restore_burst_rows(engine):
+    # puts back the ratings and album_stats rows saved by burst_rows_restored, if a snapshot is there
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass(:table)"), {"table": SNAPSHOT_STATS}).scalar() is None:
+            return False
+        conn.execute(text(f"DELETE FROM ratings r USING {SNAPSHOT_STATS} s, {SNAPSHOT_USERS} u "
+                          f"WHERE r.album_id = s.album_id AND r.user_id = u.id"))
+        conn.execute(text(f"INSERT INTO ratings SELECT * FROM {SNAPSHOT_RATINGS}"))
+        conn.execute(text(f"DELETE FROM album_stats WHERE album_id IN (SELECT album_id FROM {SNAPSHOT_STATS})"))
+        conn.execute(text(f"INSERT INTO album_stats SELECT * FROM {SNAPSHOT_STATS}"))
+        conn.execute(text(f"DROP TABLE {SNAPSHOT_STATS}, {SNAPSHOT_USERS}, {SNAPSHOT_RATINGS}"))
+    return True
+
+@contextmanager
+def burst_rows_restored(engine, fixtures):
+    # rating_burst only rates the hottest albums as fixture users, so only those rows are saved
+    albums, users = fixtures["popular_albums"][:BURST_ALBUMS], fixtures["users"]
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE {SNAPSHOT_STATS} AS SELECT * FROM album_stats "
+                          f"WHERE album_id = ANY(CAST(:albums AS uuid[]))"), {"albums": albums})
+        conn.execute(text(f"CREATE TABLE {SNAPSHOT_USERS} AS SELECT id FROM users "
+                          f"WHERE id = ANY(CAST(:users AS uuid[]))"), {"users": users})
+        conn.execute(text(f"CREATE TABLE {SNAPSHOT_RATINGS} AS SELECT * FROM ratings "
+                          f"WHERE album_id = ANY(CAST(:albums AS uuid[])) AND user_id = ANY(CAST(:users AS uuid[]))"),
+                     {"albums": albums, "users": users})
+    try:
+        yield
+    finally:
+        restore_burst_rows(engine)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(database_url, workers):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "DATABASE_URL": database_url, "REPORT_DB_QUERIES": "1"},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+        try:
+            if requests.get(f"{base_url}/openapi.json", timeout=1).ok:
+                return server, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"api didn't start within {STARTUP_TIMEOUT}s")
+
+
+class LoadRun:
+    def __init__(self, base_url, fixtures, weights, concurrency, duration, warmup, seed):
+        self.base_url = base_url
+        self.fixtures = fixtures
+        self.weights = weights
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.samples = []  # (endpoint, seconds, ok, db queries or None)
+        self.journeys = {name: 0 for name in weights}
+        self.lock = threading.Lock()
+
+    def client(self, index, measure_from, stop_at):
+        rng = random.Random(self.seed * 1000 + index)
+        session = requests.Session()
+        names, weights = list(self.weights), list(self.weights.values())
+        samples = []
+        journeys = []
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            for method, endpoint, path, params in JOURNEYS[name](self.fixtures, rng):
+                start = time.monotonic()
+                try:
+                    response = session.request(method, self.base_url + path, params=params, timeout=30)
+                    ok, queries = response.status_code < 400, response.headers.get("X-DB-Queries")
+                except requests.RequestException:
+                    ok, queries = False, None
+                if start >= measure_from:
+                    samples.append((endpoint, time.monotonic() - start, ok, int(queries) if queries else None))
+            if time.monotonic() >= measure_from:
+                journeys.append(name)
+        with self.lock:
+            self.samples.extend(samples)
+            for name in journeys:
+                self.journeys[name] += 1
+
+    def run(self):
+        measure_from = time.monotonic() + self.warmup
+        stop_at = measure_from + self.duration
+        clients = [threading.Thread(target=self.client, args=(i, measure_from, stop_at)) for i in range(self.concurrency)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        return self.samples
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(samples, duration):
+    def stats(rows):
+        latencies = sorted(seconds for _, seconds, _, _ in rows)
+        queries = [count for _, _, _, count in rows if count is not None]
+        return {
+            "requests": len(rows),
+            "errors": sum(not ok for _, _, ok, _ in rows),
+            "throughput_rps": round(len(rows) / duration, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "db_queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    by_endpoint = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample[0], []).append(sample)
+    return {endpoint: stats(rows) for endpoint, rows in sorted(by_endpoint.items())}, (stats(samples) if samples else {})
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def print_report(endpoints, total, baseline=None):
+    print(f"\n{'endpoint':40} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for endpoint, row in list(endpoints.items()) + [("total", total)]:
+        queries = "-" if row.get("db_queries_per_request") is None else f"{row['db_queries_per_request']:.1f}"
+        line = (f"{endpoint:40} {row['requests']:7,} {row['errors']:5,} {row['throughput_rps']:8.1f} "
+                f"{row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {queries:>8}")
+        before = (baseline or {}).get(endpoint)
+        if before and before.get("p95_ms"):
+            line += f"  p95 {(row['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="load-test the api with scripted traffic mixes")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="local postgres the api runs against")
+    parser.add_argument("--size", choices=PRESETS, default="small", help="generate_test_data.py preset to seed")
+    parser.add_argument("--no-seed", action="store_true", help="benchmark the database as it is")
+    parser.add_argument("--base-url", help="benchmark an api that is already running instead of starting one")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="journey=weight pairs: " + ", ".join(JOURNEYS))
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous clients")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of traffic before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the journeys and their parameters")
+    parser.add_argument("--out", help="results json (default benchmark-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results json to show p95 changes against")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    weights = parse_mix(args.mix)
+
+    if not args.no_seed:
+        print(f"🌱 seeding the {args.size} dataset...")
+        seed_database(args.database_url, args.size)
+    engine = create_engine(args.database_url)
+    if restore_burst_rows(engine):
+        print("♻️  put back the ratings an interrupted run left behind")
+    fixtures = load_fixtures(args.database_url)
+
+    server = None
+    base_url = args.base_url
+    with burst_rows_restored(engine, fixtures):
+        if base_url is None:
+            print(f"🚀 starting main:app with {args.workers} worker(s)...")
+            server, base_url = start_server(args.database_url, args.workers)
+        try:
+            print(f"🏋️  {args.concurrency} clients, {args.warmup:.0f}s warmup + {args.duration:.0f}s measured, mix {args.mix}")
+            load = LoadRun(base_url, fixtures, weights, args.concurrency, args.duration, args.warmup, args.seed)
+            samples = load.run()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+    engine.dispose()
+
+    endpoints, total = summarize(samples, args.duration)
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "size": None if args.no_seed else args.size,
+        "mix": weights,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "workers": None if args.base_url else args.workers,
+        "seed": args.seed,
+        "journeys": load.journeys,
+        "endpoints": endpoints,
+        "total": total,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            earlier = json.load(f)
+        baseline = {**earlier["endpoints"], "total": earlier["total"]}
+        print(f"\n📏 compared with {args.compare} (commit {(earlier.get('commit') or '?')[:8]})")
+    print_report(endpoints, total, baseline)
+
+    out = args.out or f"benchmark-{(commit or 'unknown')[:8]}.json"
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 results written to {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+benchmarks /search/suggestions: in-memory prefix index vs the old ilike query path
+both sides get the same synthetic catalog; the query path runs against temporary
+tables, so the real albums/users tables are never touched
+usage: python scripts/benchmark_suggestions.py [--sizes 100000 1000000] [--prefixes 300]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import io
+import random
+import statistics
+import time
+
+from database.database import engine
+from autocomplete import PrefixIndex
+
+WORDS = [
+    "the", "love", "night", "blue", "dark", "side", "moon", "black", "sun", "city", "dream",
+    "fire", "gold", "heart", "house", "light", "live", "lost", "music", "new", "red", "road",
+    "rock", "soul", "star", "summer", "time", "world", "young", "wild", "electric", "kid",
+    "computer", "butterfly", "aeroplane", "sea", "river", "ghost", "echo", "velvet", "neon",
+]
+
+def synthetic_catalog(album_count, seed=42):
+    # deterministic (title, artist, rating count) rows plus usernames
+    rng = random.Random(seed)
+    artists = [f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}" for i in range(max(1, album_count // 10))]
+    albums = []
+    for i in range(album_count):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title() + f" {i}"
+        rating_count = int(rng.paretovariate(1.2)) - 1  # a few very popular albums, a long tail
+        albums.append((title, rng.choice(artists), rating_count))
+    usernames = [f"{rng.choice(WORDS)}_{rng.choice(WORDS)}{i}" for i in range(max(1, album_count // 20))]
+    return albums, usernames
+
+def typed_prefixes(albums, usernames, count, seed=7):
+    # prefixes of 1-4 characters, as produced by someone typing into the search box
+    rng = random.Random(seed)
+    prefixes = set()
+    while len(prefixes) < count:
+        source = rng.choice(albums)[rng.choice([0, 1])] if rng.random() < 0.9 else rng.choice(usernames)
+        prefixes.add(source[:rng.randint(1, 4)].lower())
+    return sorted(prefixes)
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda fraction: samples[min(len(samples) - 1, int(fraction * len(samples)))]
+    return f"p50 {pick(0.5) * 1e6:10.1f}µs  p95 {pick(0.95) * 1e6:10.1f}µs  mean {statistics.mean(samples) * 1e6:10.1f}µs"
+
+def bench_index(albums, usernames, prefixes):
+    start = time.perf_counter()
+    album_index, artist_index, user_index = PrefixIndex(), PrefixIndex(), PrefixIndex()
+    album_index.load((i, title, count) for i, (title, _, count) in enumerate(albums))
+    artist_scores = {}
+    for _, artist, count in albums:
+        artist_scores[artist] = artist_scores.get(artist, 0) + count
+    artist_index.load((artist, artist, score) for artist, score in artist_scores.items())
+    user_index.load((name, name, 0) for name in usernames)
+    build_seconds = time.perf_counter() - start
+
+    timings = {"cold": [], "warm": []}
+    for phase in ("cold", "warm"):  # first pass misses the answer cache, second pass hits it
+        for prefix in prefixes:
+            start = time.perf_counter()
+            album_index.complete(prefix, 5)
+            artist_index.complete(prefix, 5)
+            user_index.complete(prefix, 3)
+            timings[phase].append(time.perf_counter() - start)
+    return build_seconds, timings
+
+def bench_queries(albums, usernames, prefixes):
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("CREATE TEMPORARY TABLE bench_albums (title varchar NOT NULL, artist varchar NOT NULL)")
+        cursor.execute("CREATE TEMPORARY TABLE bench_users (username varchar NOT NULL)")
+        buffer = io.StringIO("".join(f"{title}\t{artist}\n" for title, artist, _ in albums))
+        cursor.copy_expert("COPY bench_albums (title, artist) FROM STDIN", buffer)
+        cursor.copy_expert("COPY bench_users (username) FROM STDIN", io.StringIO("".join(f"{name}\n" for name in usernames)))
+        cursor.execute("ANALYZE bench_albums")
+        cursor.execute("ANALYZE bench_users")
+
+        timings = []
+        for prefix in prefixes:
+            pattern = prefix.replace("%", r"\%").replace("_", r"\_") + "%"
+            start = time.perf_counter()
+            # the three queries search_suggestions used to run per keystroke
+            cursor.execute("SELECT title FROM bench_albums WHERE title ILIKE %s LIMIT 5", (pattern,))
+            cursor.fetchall()
+            cursor.execute("SELECT DISTINCT artist FROM bench_albums WHERE artist ILIKE %s LIMIT 5", (pattern,))
+            cursor.fetchall()
+            cursor.execute("SELECT username FROM bench_users WHERE username ILIKE %s LIMIT 3", (pattern,))
+            cursor.fetchall()
+            timings.append(time.perf_counter() - start)
+        return timings
+    finally:
+        raw.rollback()
+        raw.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark autocomplete suggestions")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--prefixes", type=int, default=300)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        albums, usernames = synthetic_catalog(size)
+        prefixes = typed_prefixes(albums, usernames, args.prefixes)
+        print(f"\n📦 {size:,} albums, {len(usernames):,} users, {len(prefixes)} distinct prefixes")
+
+        build_seconds, index_timings = bench_index(albums, usernames, prefixes)
+        print(f"  index build        {build_seconds:8.2f}s")
+        print(f"  index (uncached)   {percentiles(index_timings['cold'])}")
+        print(f"  index (cached)     {percentiles(index_timings['warm'])}")
+        print(f"  database queries   {percentiles(bench_queries(albums, usernames, prefixes))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+local stand-in for musicbrainz and the cover art archive, for offline and repeatable benchmarks
+serves recorded fixture responses (export them from the response cache with export-cache);
+requests without a fixture get a synthetic answer derived from the url, so every search,
+release lookup and cover lookup answers the same way on every run (--strict gives 404 instead)
+latency, errors and musicbrainz style 503 throttling are injected from a seeded generator
+musicbrainz answers on --port, the cover art archive on --cover-art-port; point the app and the
+scripts at them with
+    MUSICBRAINZ_URL=http://127.0.0.1:8089/ws/2 COVER_ART_URL=http://127.0.0.1:8090
+(and a separate MUSICBRAINZ_CACHE_PATH / higher MUSICBRAINZ_RATE_LIMIT as the benchmark needs)
+usage:
+    python scripts/fake_musicbrainz.py serve [--fixtures fixtures.json] [--latency 50] [--jitter 20]
+        [--error-rate 0.01] [--throttle-rate 0.02] [--rate-limit 10] [--seed 1] [--strict]
+    python scripts/fake_musicbrainz.py export-cache fixtures.json [--cache path] [--musicbrainz-url url]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# musicbrainz.cache.DEFAULT_PATH; not imported, since importing the musicbrainz package opens the
+# real response cache and rate limiter files
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  ".cache", "musicbrainz.sqlite3")
+
+# where recorded responses come from by default; fixture keys are relative to these
+RECORDED_URLS = {
+    "musicbrainz": "https://musicbrainz.org/ws/2",
+    "coverartarchive": "https://coverartarchive.org",
+}
+MUSICBRAINZ_PREFIX = "/ws/2"
+COVER_ART_SHARE = 0.8  # synthetic releases with front cover art
+FIXTURE_NAMESPACE = uuid.UUID("6d6f636b-6d62-4000-8000-000000000000")
+
+WORDS = [
+    "Silent", "Electric", "Golden", "Broken", "Velvet", "Hollow", "Neon", "Midnight", "Crystal",
+    "Dreams", "Rivers", "Machines", "Hearts", "Horizons", "Signals", "Echoes", "Ghosts", "Summers",
+]
+TYPES = ["Album", "Album", "Album", "EP", "Single", "Compilation", "Live"]
+STATUSES = ["Official", "Official", "Official", "Promotion", "Bootleg"]
+COUNTRIES = ["US", "GB", "DE", "JP", "FR", "XW"]
+
+
+def request_key(path, params):
+    # same shape as the app's cache keys (musicbrainz.cache_key), relative to the service's base url
+    return f"{path}?{urlencode(sorted(params.items()))}" if params else path
+
+def seeded(*parts):
+    return random.Random(hashlib.sha256("\x1f".join(parts).encode()).digest())
+
+def has_cover_art(mbid):
+    return seeded("cover", mbid).random() < COVER_ART_SHARE
+
+def synthetic_release(mbid, inc=""):
+    # what a release looks like in search results and lookups; derived from the mbid only, so a
+    # search result and the lookup of the same release agree
+    rng = seeded("release", mbid)
+    artist = f"{rng.choice(WORDS)} {rng.choice(WORDS)}"
+    release = {
+        "id": mbid,
+        "title": f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+        "status": rng.choice(STATUSES),
+        "date": f"{rng.randint(1960, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "country": rng.choice(COUNTRIES),
+        "artist-credit": [{"name": artist, "artist": {"id": str(uuid.uuid5(FIXTURE_NAMESPACE, artist)), "name": artist}}],
+        "release-group": {
+            "id": str(uuid.uuid5(FIXTURE_NAMESPACE, f"group {mbid}")),
+            "primary-type": rng.choice(TYPES),
+            "tags": [{"name": f"tag{i}", "count": rng.randint(1, 20)} for i in range(rng.randint(0, 12))],
+            "rating": {"value": round(rng.uniform(1, 5), 2), "votes-count": rng.randint(0, 40)},
+        },
+        "cover-art-archive": {"front": has_cover_art(mbid), "artwork": has_cover_art(mbid)},
+    }
+    if "annotation" in inc:
+        release["annotation"] = f"{release['title']} is the {rng.choice(['debut', 'second', 'final'])} album by {artist}."
+    if "recordings" in inc:
+        release["media"] = [{
+            "position": 1,
+            "tracks": [
+                {"position": n, "title": f"Track {n}", "recording": {"length": rng.randint(90_000, 420_000)}}
+                for n in range(1, rng.randint(6, 16))
+            ],
+        }]
+    return release
+
+def synthetic_search(query, limit, offset):
+    releases = []
+    for i in range(offset, offset + limit):
+        release = synthetic_release(str(uuid.uuid5(FIXTURE_NAMESPACE, f"{query}\x1f{i}")))
+        release["score"] = max(1, 100 - i)
+        releases.append(release)
+    return {"created": "2025-01-01T00:00:00.000Z", "count": offset + limit * 10, "offset": offset, "releases": releases}
+
+def synthetic_cover_art(mbid, base_url):
+    if not has_cover_art(mbid):
+        return None
+    image = f"{base_url}/release/{mbid}/front"
+    return {
+        "release": f"https://musicbrainz.org/release/{mbid}",
+        "images": [{"front": True, "back": False, "types": ["Front"], "image": f"{image}.jpg",
+                    "thumbnails": {"250": f"{image}-250.jpg", "500": f"{image}-500.jpg"}}],
+    }
+
+
+class StandIn:
+    def __init__(self, fixtures, latency, jitter, error_rate, throttle_rate, rate_limit, seed, strict):
+        self.fixtures = fixtures  # service -> request key -> {"status", "body"}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.strict = strict
+        self.rng = random.Random(seed)
+        self.tokens = rate_limit
+        self.refilled_at = time.monotonic()
+        self.stats = {"requests": 0, "fixture": 0, "synthetic": 0, "not_found": 0, "errors": 0, "throttled": 0}
+        self.lock = threading.Lock()
+
+    def _over_rate_limit(self):
+        # token bucket like musicbrainz's per-client limit, 0 turns it off
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        self.tokens = min(self.rate_limit, self.tokens + (now - self.refilled_at) * self.rate_limit)
+        self.refilled_at = now
+        if self.tokens < 1:
+            return True
+        self.tokens -= 1
+        return False
+
+    def _answer(self, service, path, params, base_url):
+        # (status, body, how) from the fixtures, or synthesized from the request
+        recorded = self.fixtures.get(service, {}).get(request_key(path, params))
+        if recorded is not None:
+            return recorded["status"], recorded["body"], "fixture"
+        if self.strict:
+            return 404, None, "not_found"
+        parts = path.strip("/").split("/")
+        if service == "coverartarchive" and len(parts) == 2 and parts[0] == "release":
+            art = synthetic_cover_art(parts[1], base_url)
+            return (200, art, "synthetic") if art else (404, None, "not_found")
+        if service == "musicbrainz" and parts == ["release"] and "query" in params:
+            limit = min(int(params.get("limit", 25)), 100)
+            return 200, synthetic_search(params["query"], limit, int(params.get("offset", 0))), "synthetic"
+        if service == "musicbrainz" and len(parts) == 2 and parts[0] == "release":
+            return 200, synthetic_release(parts[1], params.get("inc", "")), "synthetic"
+        return 404, None, "not_found"
+
+    def count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    async def handle(self, service, path, params, base_url):
+        with self.lock:
+            self.stats["requests"] += 1
+            delay = (self.latency + self.rng.uniform(0, self.jitter)) / 1000
+            throttled = self._over_rate_limit() or self.rng.random() < self.throttle_rate
+            failed = not throttled and self.rng.random() < self.error_rate
+        await asyncio.sleep(delay)
+        if throttled:
+            self.count("throttled")
+            return JSONResponse(
+                {"error": "Your requests are exceeding the allowable rate limit."}, status_code=503, headers={"Retry-After": "1"}
+            )
+        if failed:
+            self.count("errors")
+            return JSONResponse({"error": "Internal server error (injected)"}, status_code=500)
+        status, body, how = self._answer(service, path, params, base_url)
+        self.count(how)
+        if status == 404 and body is None:
+            return JSONResponse({"error": "Not Found"}, status_code=404)
+        return JSONResponse(body, status_code=status)
+
+
+def create_app(stand_in):
+    app = FastAPI(title="musicbrainz stand-in", docs_url=None, redoc_url=None)
+
+    @app.get("/_stats")
+    def stats():
+        return stand_in.snapshot()
+
+    @app.get("/{path:path}")
+    async def answer(path: str, request: Request):
+        # musicbrainz lives under /ws/2, anything else is a cover art archive path
+        path = "/" + path
+        params = {key: value for key, value in request.query_params.items()}
+        base_url = str(request.base_url).rstrip("/")
+        if path.startswith(MUSICBRAINZ_PREFIX + "/"):
+            return await stand_in.handle("musicbrainz", path[len(MUSICBRAINZ_PREFIX):], params, base_url)
+        return await stand_in.handle("coverartarchive", path, params, base_url)
+
+    return app
+
+def load_fixtures(path):
+    if not path:
+        return {}
+    with open(path) as f:
+        fixtures = json.load(f)
+    print(f"📼 {sum(len(responses) for responses in fixtures.values()):,} recorded responses from {path}")
+    return fixtures
+
+def export_cache(cache_path, out, recorded_urls):
+    # every cached musicbrainz / cover art archive response (expired ones too) as fixtures
+    fixtures = {service: {} for service in recorded_urls}
+    conn = sqlite3.connect(cache_path)
+    try:
+        for key, status, body in conn.execute("SELECT key, status, body FROM responses ORDER BY key"):
+            for service, base in recorded_urls.items():
+                if key.startswith(base + "/"):
+                    fixtures[service][key[len(base):]] = {"status": status, "body": json.loads(body) if body is not None else None}
+    finally:
+        conn.close()
+    with open(out, "w") as f:
+        json.dump(fixtures, f, indent=1, sort_keys=True)
+    print(f"💾 exported {', '.join(f'{len(responses):,} {service}' for service, responses in fixtures.items())} responses to {out}")
+
+async def serve(app, host, ports):
+    servers = [uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning")) for port in ports]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+def main():
+    parser = argparse.ArgumentParser(description="local musicbrainz / cover art archive stand-in")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="answer musicbrainz and cover art archive requests locally")
+    serve_parser.add_argument("--fixtures", help="recorded responses (see export-cache)")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8089, help="musicbrainz port (base url .../ws/2)")
+    serve_parser.add_argument("--cover-art-port", type=int, default=8090, help="cover art archive port")
+    serve_parser.add_argument("--latency", type=float, default=0, help="milliseconds added to every answer")
+    serve_parser.add_argument("--jitter", type=float, default=0, help="up to this many more milliseconds, uniformly")
+    serve_parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered 500")
+    serve_parser.add_argument("--throttle-rate", type=float, default=0, help="share of requests answered 503 + Retry-After")
+    serve_parser.add_argument("--rate-limit", type=float, default=0, help="requests/second before answering 503, 0 for none")
+    serve_parser.add_argument("--seed", type=int, default=1, help="seed of the injected latency and faults")
+    serve_parser.add_argument("--strict", action="store_true", help="404 for requests without a fixture")
+    export_parser = subparsers.add_parser("export-cache", help="turn the response cache into a fixtures file")
+    export_parser.add_argument("out", help="fixtures json to write")
+    export_parser.add_argument("--cache", default=os.getenv("MUSICBRAINZ_CACHE_PATH", DEFAULT_CACHE_PATH), help="response cache file")
+    export_parser.add_argument("--musicbrainz-url", default=RECORDED_URLS["musicbrainz"], help="base url the cache recorded")
+    export_parser.add_argument("--cover-art-url", default=RECORDED_URLS["coverartarchive"], help="base url the cache recorded")
+    args = parser.parse_args()
+
+    if args.command == "export-cache":
+        recorded_urls = {"musicbrainz": args.musicbrainz_url.rstrip("/"), "coverartarchive": args.cover_art_url.rstrip("/")}
+        export_cache(args.cache, args.out, recorded_urls)
+        return
+
+    stand_in = StandIn(load_fixtures(args.fixtures), args.latency, args.jitter, args.error_rate,
+                       args.throttle_rate, args.rate_limit, args.seed, args.strict)
+    print(f"🎭 musicbrainz on http://{args.host}:{args.port}{MUSICBRAINZ_PREFIX}, "
+          f"cover art archive on http://{args.host}:{args.cover_art_port}")
+    print(f"   MUSICBRAINZ_URL=http://{args.host}:{args.port}{MUSICBRAINZ_PREFIX} "
+          f"COVER_ART_URL=http://{args.host}:{args.cover_art_port}")
+    asyncio.run(serve(create_app(stand_in), args.host, [args.port, args.cover_art_port]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+fills the database with synthetic albums, users, ratings, reviews and lists for load testing
+everything comes from one seeded numpy generator, so the same seed and sizes always give the
+same database (ids included: they encode table, seed and row number)
+album popularity and user activity are zipf distributed: a few albums get most of the ratings
+and a few users write most of them, like on the real site
+rows are generated a chunk at a time as numpy columns, formatted to csv in one % per chunk and
+loaded with postgres COPY; trending is replaced by the most rated albums; the foreign keys of
+the loaded tables are dropped for the load and added back (checked in one pass) at the end, so
+run it against a database the api isn't writing to; album_stats is rebuilt from the ratings at
+the end
+every generated user can log in with the password "loadtest"
+usage: python scripts/generate_test_data.py [--albums 10000] [--users 2000] [--ratings 200000]
+       [--reviews 20000] [--lists 1000] [--seed 1] [--skew 1.0]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import io
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from sqlalchemy import select, text
+
+from database.database import engine, LocalSession
+from database.album_stats import rebuild_album_stats
+from database.models import AlbumStats, TrendingAlbum
+from database import migrations
+from musicbrainz import PLACEHOLDER_COVER_URL
+from password_hashing import hash_password
+
+PASSWORD = "loadtest"
+LOADED_TABLES = ("ratings", "reviews", "lists", "list_items")
+CHUNK = 500_000  # rows generated and copied per round, part of what the seed reproduces
+USER_SKEW = 0.8  # zipf exponent of ratings per user
+TOP_UP_ROUNDS = 8  # redraws for ratings lost to a user picking the same album twice
+ITEMS_PER_LIST = (5, 25)
+
+# table -> first uuid group, the second group is the seed and the last one the row number
+ID_PREFIXES = {
+    "albums": "5eed0a1b",
+    "users": "5eed05e5",
+    "ratings": "5eed0ae7",
+    "reviews": "5eed0e71",
+    "lists": "5eed0115",
+    "list_items": "5eed0175",
+    "trending_albums": "5eed0777",
+}
+TRENDING = 25
+
+ADJECTIVES = [
+    "Silent", "Electric", "Golden", "Broken", "Endless", "Velvet", "Hollow", "Neon", "Paper",
+    "Midnight", "Crystal", "Wild", "Distant", "Burning", "Quiet", "Northern", "Faded", "Glass",
+    "Lonely", "Savage", "Bright", "Frozen", "Crimson", "Secret", "Sweet", "Heavy", "Lucid",
+]
+NOUNS = [
+    "Dreams", "Rivers", "Machines", "Hearts", "Horizons", "Gardens", "Signals", "Echoes", "Cities",
+    "Waves", "Ghosts", "Summers", "Shadows", "Engines", "Letters", "Mountains", "Mirrors", "Nights",
+    "Satellites", "Flowers", "Highways", "Oceans", "Streets", "Stars", "Forests", "Radios", "Tides",
+]
+ARTIST_FIRST = [
+    "The", "Black", "Young", "Little", "Big", "Lady", "DJ", "Saint", "King", "Captain", "Doctor",
+    "Sister", "Brother", "Lil", "Mister", "Baby", "Royal", "Blue", "Red", "Green",
+]
+ARTIST_LAST = [
+    "Owls", "Foxes", "Harbor", "Static", "Parade", "Kid", "Wolves", "Collective", "Orchestra",
+    "Machine", "Society", "Ritual", "Choir", "Union", "Youth", "Cult", "Phantoms", "Saints",
+    "Drifters", "Riot", "Lights", "Tapes", "Motel", "Rebels", "Giants",
+]
+REVIEW_SENTENCES = [
+    "An instant classic.", "Grew on me after a few listens.", "The production is stunning.",
+    "Front-loaded but the closer is great.", "Overrated if you ask me.", "Perfect late night album.",
+    "The lyrics hit hard.", "A bit too long.", "Every track is a single.", "Not their best work.",
+    "Would play this on repeat.", "The second half drags.", "Beautiful arrangements throughout.",
+    "Raw and honest.", "I keep coming back to this one.", "Sounds dated now.",
+]
+REVIEW_TEXTS = [f"{a} {b}" for a in REVIEW_SENTENCES for b in REVIEW_SENTENCES]
+LIST_TITLES = [
+    "Favorites", "Road trip", "Best of the decade", "Rainy days", "Desert island picks",
+    "Underrated gems", "Workout", "To listen", "Essentials", "Guilty pleasures",
+]
+
+EPOCH = np.datetime64("1960-01-01")
+ACTIVITY_START = np.datetime64("2020-01-01")
+END = np.datetime64("2026-01-01")  # fixed rather than today so a seed gives the same dates every day
+
+
+def id_format(table, seed):
+    # printf format of the table's uuids, filled in with the row number
+    return f"{ID_PREFIXES[table]}-{seed:04x}-4000-8000-%012x"
+
+def zipf_cdf(n, skew):
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -skew
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+def zipf_pick(rng, cdf, ranked, size):
+    # draws row numbers by zipf rank; ranked maps rank -> row so popular rows are spread over the ids
+    ranks = np.minimum(np.searchsorted(cdf, rng.random(size)), len(cdf) - 1)
+    return ranked[ranks]
+
+def sorted_unique(values):
+    # sort + neighbour compare, several times faster than np.unique's hashing on big int arrays
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+# every date from EPOCH to END as csv text, formatting datetime64 per row is slow
+DATES = (EPOCH + np.arange((END - EPOCH).astype(int))).astype(str)
+
+def random_dates(rng, start, days, size):
+    return DATES[(start - EPOCH).astype(int) + rng.integers(0, days, size)]
+
+def csv_block(row_format, *columns):
+    # formats whole numpy columns row by row with a single % (in C), much faster than csv.writer
+    n = len(columns[0])
+    flat = [None] * (n * len(columns))
+    for i, column in enumerate(columns):
+        flat[i::len(columns)] = column.tolist()
+    return (row_format * n) % tuple(flat)
+
+def copy_block(conn, table, columns, block):
+    with conn.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", io.StringIO(block))
+    conn.commit()
+
+@contextmanager
+def foreign_keys_dropped(conn, tables):
+    # checking each COPYed row against its parents costs more than the load itself; adding the
+    # constraints back afterwards validates every row in one join per constraint
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE contype = 'f' AND conrelid::regclass::text = ANY(%s)",
+            (list(tables),)
+        )
+        constraints = cursor.fetchall()
+        for table, name, _ in constraints:
+            cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.rollback()
+        print("🔗 restoring foreign keys...")
+        with conn.cursor() as cursor:
+            for table, name, definition in constraints:
+                cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+        conn.commit()
+
+
+class Generator:
+    def __init__(self, conn, args):
+        self.conn = conn
+        self.args = args
+        self.rng = np.random.default_rng(args.seed)
+        self.ids = {table: id_format(table, args.seed) for table in ID_PREFIXES}
+        self.counts = {}
+
+    def report(self, table, rows, started):
+        self.counts[table] = self.counts.get(table, 0) + rows
+        elapsed = time.monotonic() - started
+        print(f"📦 {table}: {self.counts[table]:,} rows ({self.counts[table] / elapsed:,.0f} rows/s)")
+
+    def albums(self):
+        n, rng = self.args.albums, self.rng
+        artists = max(1, n // 8)
+        started = time.monotonic()
+        row = f"{self.ids['albums']},%s %s,%s %s %d,%s,{PLACEHOLDER_COVER_URL}\n"
+        for start in range(0, n, CHUNK):
+            size = min(CHUNK, n - start)
+            artist = rng.integers(0, artists, size)
+            block = csv_block(
+                row,
+                np.arange(start, start + size),
+                np.array(ADJECTIVES)[rng.integers(0, len(ADJECTIVES), size)],
+                np.array(NOUNS)[rng.integers(0, len(NOUNS), size)],
+                np.array(ARTIST_FIRST)[artist % len(ARTIST_FIRST)],
+                np.array(ARTIST_LAST)[artist // len(ARTIST_FIRST) % len(ARTIST_LAST)],
+                artist,
+                random_dates(rng, EPOCH, (END - EPOCH).astype(int), size),
+            )
+            copy_block(self.conn, "albums", ("id", "title", "artist", "release_date", "cover_url"), block)
+            self.report("albums", size, started)
+        # how good each album is (ratings scatter around it) and its popularity rank
+        self.album_quality = np.clip(rng.normal(7, 1.3, n), 2, 9.5)
+        self.album_ranked = rng.permutation(n)
+        self.album_cdf = zipf_cdf(n, self.args.skew)
+
+    def users(self):
+        n, rng = self.args.users, self.rng
+        password_hash = hash_password(PASSWORD)  # one bcrypt hash shared by every user
+        prefix = f"loadtest_{self.args.seed}_"
+        started = time.monotonic()
+        row = f"{self.ids['users']},{prefix}%d,{prefix}%d@test.com,{password_hash},%s\n"
+        for start in range(0, n, CHUNK):
+            size = min(CHUNK, n - start)
+            numbers = np.arange(start, start + size)
+            block = csv_block(row, numbers, numbers, numbers,
+                              random_dates(rng, ACTIVITY_START, (END - ACTIVITY_START).astype(int), size))
+            copy_block(self.conn, "users", ("id", "username", "email", "password_hash", "created_at"), block)
+            self.report("users", size, started)
+        self.user_ranked = rng.permutation(n)
+        self.user_cdf = zipf_cdf(n, USER_SKEW)
+
+    def ratings(self):
+        # ratings per user first, then users in blocks so a user's ratings can be deduped per album
+        # within one chunk; picks that are still duplicates after the top-up rounds drop out, so
+        # slightly less than --ratings may be written
+        rng, albums = self.rng, self.args.albums
+        per_user = np.minimum(rng.multinomial(self.args.ratings, np.diff(self.user_cdf, prepend=0)), max(1, albums // 2))
+        per_user = per_user[np.argsort(self.user_ranked)]  # rank -> user row
+        review_share = min(1.0, self.args.reviews / max(1, self.args.ratings))
+        activity_days = (END - ACTIVITY_START).astype(int)
+        rating_row = f"{self.ids['ratings']},{self.ids['albums']},{self.ids['users']},%d,%s\n"
+        review_row = f"{self.ids['reviews']},{self.ids['albums']},{self.ids['users']},%d,%s,%s\n"
+        ends = np.cumsum(per_user)
+        block_ends = np.searchsorted(ends, np.arange(CHUNK, ends[-1] + CHUNK, CHUNK), side="right")
+        started = time.monotonic()
+        first_user = rating_id = review_id = 0
+        for last_user in np.unique(np.append(block_ends, len(per_user))):
+            if last_user <= first_user:
+                continue
+            wanted = per_user[first_user:last_user]
+            pairs = np.empty(0, dtype=np.int64)
+            for _ in range(TOP_UP_ROUNDS):
+                missing = wanted - np.bincount(pairs // albums - first_user, minlength=len(wanted))
+                if not missing.any():
+                    break
+                users = np.repeat(np.arange(first_user, last_user, dtype=np.int64), missing)
+                picks = zipf_pick(rng, self.album_cdf, self.album_ranked, len(users))
+                pairs = sorted_unique(np.concatenate((pairs, users * albums + picks)))
+            first_user = last_user
+            # album-major order keeps the (album_id, user_id) index and the album lookups local
+            pairs = pairs[np.argsort(pairs % albums, kind="stable")]
+            users, picked = pairs // albums, pairs % albums
+            values = np.clip(np.rint(self.album_quality[picked] + rng.normal(0, 1.5, len(picked))), 1, 10).astype(int)
+            dates = random_dates(rng, ACTIVITY_START, activity_days, len(picked))
+            ids = np.arange(rating_id, rating_id + len(picked))
+            rating_id += len(picked)
+            copy_block(self.conn, "ratings", ("id", "album_id", "user_id", "rating", "created_at"),
+                       csv_block(rating_row, ids, picked, users, values, dates))
+            self.report("ratings", len(picked), started)
+
+            reviewed = rng.random(len(picked)) < review_share
+            count = int(reviewed.sum())
+            if count:
+                texts = np.array(REVIEW_TEXTS)[rng.integers(0, len(REVIEW_TEXTS), count)]
+                copy_block(self.conn, "reviews", ("id", "album_id", "user_id", "rating", "review_text", "created_at"),
+                           csv_block(review_row, np.arange(review_id, review_id + count), picked[reviewed],
+                                     users[reviewed], values[reviewed], texts, dates[reviewed]))
+                review_id += count
+                self.report("reviews", count, started)
+
+    def lists(self):
+        n, rng, albums = self.args.lists, self.rng, self.args.albums
+        if not n:
+            return
+        started = time.monotonic()
+        list_row = f"{self.ids['lists']},{self.ids['users']},%s %d,%s,%s,%s\n"
+        item_row = f"{self.ids['list_items']},{self.ids['lists']},{self.ids['albums']},%s,%s\n"
+        item_id = 0
+        per_chunk = max(1, CHUNK // ITEMS_PER_LIST[1])
+        for start in range(0, n, per_chunk):
+            size = min(per_chunk, n - start)
+            numbers = np.arange(start, start + size)
+            owners = zipf_pick(rng, self.user_cdf, self.user_ranked, size)
+            ranked = rng.random(size) < 0.3
+            dates = random_dates(rng, ACTIVITY_START, (END - ACTIVITY_START).astype(int), size)
+            copy_block(self.conn, "lists", ("id", "user_id", "title", "is_public", "is_ranked", "created_at"),
+                       csv_block(list_row, numbers, owners, np.array(LIST_TITLES)[numbers % len(LIST_TITLES)],
+                                 numbers, rng.random(size) < 0.9, ranked, dates))
+            self.report("lists", size, started)
+
+            lengths = np.minimum(rng.integers(ITEMS_PER_LIST[0], ITEMS_PER_LIST[1] + 1, size), albums)
+            lists = np.repeat(numbers, lengths)
+            # unique keeps the first pick of an album per list, position is the order it was picked in
+            keys, first = np.unique(lists.astype(np.int64) * albums + zipf_pick(rng, self.album_cdf, self.album_ranked, len(lists)),
+                                    return_index=True)
+            order = np.argsort(first, kind="stable")
+            lists, picked = keys[order] // albums, keys[order] % albums
+            list_starts = np.searchsorted(lists, lists, side="left")
+            positions = np.where(ranked[lists - start], (np.arange(len(lists)) - list_starts + 1).astype(str), "")
+            copy_block(self.conn, "list_items", ("id", "list_id", "album_id", "position", "added_at"),
+                       csv_block(item_row, np.arange(item_id, item_id + len(lists)), lists, picked, positions,
+                                 dates[lists - start]))
+            item_id += len(lists)
+            self.report("list_items", len(lists), started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate a large deterministic synthetic dataset for load testing")
+    parser.add_argument("--albums", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--ratings", type=int, default=200_000, help="target count, duplicates per user and album drop out")
+    parser.add_argument("--reviews", type=int, default=20_000, help="about this many ratings also get a review")
+    parser.add_argument("--lists", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=1, help="0-65535, runs with different seeds can share a database")
+    parser.add_argument("--skew", type=float, default=1.0, help="zipf exponent of album popularity")
+    args = parser.parse_args()
+    if not 0 <= args.seed <= 0xFFFF:
+        parser.error("--seed must be between 0 and 65535")
+
+    if migrations.current(engine) < migrations.head():
+        sys.exit("❌ database schema is out of date, run scripts/migrate.py upgrade first")
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM albums WHERE id = %s", (id_format("albums", args.seed) % 0,))
+            if cursor.fetchone():
+                print(f"❌ seed {args.seed} is already loaded, use another --seed or a fresh database")
+                return
+        started = time.monotonic()
+        generator = Generator(conn, args)
+        generator.albums()
+        generator.users()
+        with foreign_keys_dropped(conn, LOADED_TABLES):
+            generator.ratings()
+            generator.lists()
+    finally:
+        conn.close()
+
+    db = LocalSession()
+    try:
+        print("📊 rebuilding album_stats...")
+        rebuild_album_stats(db)
+        # the homepage shows trending albums, like seeding.py this replaces the current ones
+        top = db.execute(
+            select(AlbumStats.album_id).order_by(AlbumStats.rating_count.desc(), AlbumStats.album_id).limit(TRENDING)
+        ).scalars().all()
+        db.query(TrendingAlbum).delete()
+        db.add_all(
+            TrendingAlbum(id=id_format("trending_albums", args.seed) % rank, album_id=album_id, rank=rank, week_start=END.item())
+            for rank, album_id in enumerate(top, start=1)
+        )
+        db.commit()
+        db.execute(text("ANALYZE"))
+        db.commit()
+    finally:
+        db.close()
+    print(f"\n🎉 Generated {', '.join(f'{count:,} {table}' for table, count in generator.counts.items())} "
+          f"in {time.monotonic() - started:.0f}s")
+
+if __name__ == "__main__":
+    main()
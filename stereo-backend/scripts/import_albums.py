@@ -2,42 +2,84 @@
 """
 Smart album import with popularity filtering
 Uses multiple signals to determine album relevance/popularity
+Progress is checkpointed per batch; run with --resume to continue an interrupted import
+Run with --incremental for nightly refreshes that only search releases newer than the last sync
 """
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+import argparse
+import queue
+import threading
+import time
 import uuid
+from datetime import date, datetime, timedelta, timezone
 import requests
-import time
-from datetime import date, datetime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, insert, update
 from dotenv import load_dotenv
 
-from database.models import Album, Base
+from database.models import Album, ImportCheckpoint, ImportRun, ImportSyncState
+from database import migrations
+from covers import MISSING, PENDING, RESOLVED, cover_resolver
+import musicbrainz
 
 load_dotenv()
 
+STOP = object()  # end-of-stream marker passed between pipeline stages
+REPORT_EVERY = 10  # seconds between throughput reports
+# incremental runs search from each family's high-water release date minus this, to pick up
+# releases that were entered into musicbrainz late with a date just before it
+SYNC_OVERLAP = timedelta(days=30)
+
 class PopularityFilteredImporter:
-    def __init__(self):
+    IMPORTER = "popularity"  # import_runs.importer of this script's runs
+    
+    def __init__(self, resume=False, incremental=False):
         DATABASE_URL = os.getenv("DATABASE_URL")
         if not DATABASE_URL:
             raise ValueError("DATABASE_URL environment variable not set")
         
         self.engine = create_engine(DATABASE_URL)
-        Base.metadata.create_all(bind=self.engine)
+        if migrations.current(self.engine) < migrations.head():
+            sys.exit("❌ database schema is out of date, run scripts/migrate.py upgrade first")
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
         
         self.imported_count = 0
         self.target_count = 2000  # Target 2000 quality albums
         self.rejected_count = 0
+        
+        # pipeline: search producers -> cover workers -> one batched db writer
+        self.search_workers = 2  # searches are paced by the shared musicbrainz rate limiter anyway
+        self.cover_workers = 8
+        self.queue_size = 200
+        self.batch_size = 50
+        self.done = threading.Event()  # set once the target is reached (or the writer failed)
+        self.error = None
+        self.lock = threading.Lock()
+        
+        # checkpointing: a query is complete once all its releases are committed or rejected
+        self.resume = resume
+        self.run_id = None
+        self.outstanding = {}  # query -> releases not settled yet
+        self.known_mbids = set()  # mbids in the database or in a pending batch
+        self.finished_queries = set()  # completed queries, checkpointed or not
+        
+        # incremental sync: only search releases dated from each family's high-water mark on
+        self.incremental = incremental
+        self.query_families = {}  # query -> family
+        self.high_water = {}  # family -> newest release date seen this run
+        self.completed = []  # completed queries not checkpointed yet
     
-    def get_popularity_score(self, release, artist_releases_count=None):
+    @staticmethod
+    def get_popularity_score(release, artist_releases_count=None):
         """
         Calculate popularity score based on multiple signals
         Returns score 0-100 (higher = more popular/relevant)
+        Run once per release, the score travels with the release through the pipeline
         """
         score = 0
         
@@ -122,48 +164,45 @@ class PopularityFilteredImporter:
         return max(0, min(100, score))  # Clamp to 0-100
     
     def search_popular_releases(self, query, max_results=100):
-        """Search for releases and filter by popularity"""
+        """Search for releases and filter by popularity: (release, score) pairs, None if the search failed"""
         try:
-            response = requests.get(
-                "https://musicbrainz.org/ws/2/release",
-                params={
-                    "query": query,
-                    "fmt": "json",
-                    "limit": max_results,
-                    # Include additional data for popularity scoring
-                    "inc": "release-groups+tags+ratings"
-                },
-                headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-                timeout=30
+            # Include additional data for popularity scoring; re-runs hit the response cache
+            # and pacing comes from the MusicBrainz rate limiter shared with the api
+            releases = musicbrainz.search_releases(
+                query,
+                limit=max_results,
+                inc="release-groups+tags+ratings",
+                timeout=30,
+                priority=musicbrainz.BACKGROUND,
+                policy=musicbrainz.SYNC_POLICY if self.incremental else musicbrainz.SEARCH_POLICY
             )
             
-            if response.status_code == 200:
-                data = response.json()
-                releases = data.get('releases', [])
-                
-                # Score and filter releases
-                scored_releases = []
-                for release in releases:
-                    score = self.get_popularity_score(release)
-                    if score >= 30:  # Minimum popularity threshold
-                        scored_releases.append((release, score))
-                
-                # Sort by score (highest first)
-                scored_releases.sort(key=lambda x: x[1], reverse=True)
-                
-                return [release for release, score in scored_releases[:20]]  # Top 20
+            # Score and filter releases, each scored once
+            scored_releases = []
+            for release in releases:
+                score = self.get_popularity_score(release)
+                if score >= 30:  # Minimum popularity threshold
+                    scored_releases.append((release, score))
+            
+            # Sort by score (highest first)
+            scored_releases.sort(key=lambda x: x[1], reverse=True)
+            
+            return scored_releases[:20]  # Top 20
             
         except Exception as e:
             print(f"❌ Search error for '{query}': {e}")
         
-        return []
+        return None
     
-    def get_popular_searches(self):
+    def get_popular_searches(self, since=None):
         """
-        Generate search queries targeting popular/relevant albums
+        Generate search queries targeting popular/relevant albums, as (family, query) pairs
         Uses multiple strategies to find notable releases
+        With since ({family: date}), families listed there only ask for releases dated from then on
         """
+        since = since or {}
         searches = []
+        current_year = datetime.now().year
         
         # 1. Year-based searches for important periods
         important_years = [
@@ -174,12 +213,18 @@ class PopularityFilteredImporter:
             # Modern era
             *range(2000, 2025)
         ]
+        year_dates = [f'date:{year}' for year in important_years]
+        if 'year' in since:
+            start = since['year']
+            year_dates = [f'date:[{start} TO {start.year}-12-31]'] + [
+                f'date:{year}' for year in range(start.year + 1, current_year + 1)
+            ]
         
-        for year in important_years:
-            searches.extend([
-                f'date:{year} AND status:official AND type:album',
-                f'date:{year} AND status:official AND type:album AND country:US',
-                f'date:{year} AND status:official AND type:album AND country:GB'
+        for date_clause in year_dates:
+            searches.extend(('year', query) for query in [
+                f'{date_clause} AND status:official AND type:album',
+                f'{date_clause} AND status:official AND type:album AND country:US',
+                f'{date_clause} AND status:official AND type:album AND country:GB'
             ])
         
         # 2. Genre-based searches for popular genres
@@ -190,7 +235,10 @@ class PopularityFilteredImporter:
         ]
         
         for genre in popular_genres:
-            searches.extend([
+            if 'genre' in since:
+                searches.append(('genre', f'tag:{genre} AND status:official AND type:album AND date:[{since["genre"]} TO *]'))
+                continue
+            searches.extend(('genre', query) for query in [
                 f'tag:{genre} AND status:official AND type:album',
                 f'tag:{genre} AND status:official AND type:album AND date:[2000-01-01 TO 2024-12-31]'
             ])
@@ -202,27 +250,25 @@ class PopularityFilteredImporter:
             'Island', 'Elektra', 'Geffen', 'Parlophone'
         ]
         
+        label_dates = f' AND date:[{since["label"]} TO *]' if 'label' in since else ''
         for label in major_labels:
-            searches.append(f'label:{label} AND status:official AND type:album')
+            searches.append(('label', f'label:{label} AND status:official AND type:album{label_dates}'))
         
         # 4. Country-based searches (major music markets)
         major_markets = ['US', 'GB', 'CA', 'AU', 'DE', 'FR', 'JP']
+        country_dates = '[1960-01-01 TO 2024-12-31]'
+        if 'country' in since:
+            country_dates = f'[{max(since["country"], date(1960, 1, 1))} TO *]'
         for country in major_markets:
             searches.extend([
-                f'country:{country} AND status:official AND type:album AND date:[1960-01-01 TO 2024-12-31]'
+                ('country', f'country:{country} AND status:official AND type:album AND date:{country_dates}')
             ])
         
         return searches
     
-    def should_import_release(self, release):
-        """Final filter before import"""
-        # Check if already exists
-        mbid = release.get('id')
-        if mbid:
-            existing = self.session.query(Album).filter(Album.musicbrainz_id == mbid).first()
-            if existing:
-                return False
-        
+    @staticmethod
+    def should_import_release(release, score):
+        """Final filter before import (quality and score, duplicates are checked against known_mbids)"""
         # Basic quality checks
         title = release.get('title', '').strip()
         if not title or len(title) < 2:
@@ -237,75 +283,63 @@ class PopularityFilteredImporter:
         if 'various' in artist_name or len(artist_name) < 2:
             return False
         
-        # Calculate final popularity score
-        score = self.get_popularity_score(release)
         return score >= 35  # Higher threshold for final import
     
-    def import_release(self, release):
-        """Import a release to database"""
-        try:
-            mbid = release['id']
-            title = release['title']
-            artist_name = release['artist-credit'][0]['artist']['name']
-            
-            # Get additional metadata
-            cover_url = self.get_cover_art_url(mbid)
-            release_date = self.parse_release_date(release.get('date', ''))
-            
-            # Create album
-            album = Album(
-                id=uuid.uuid4(),
-                title=title,
-                artist=artist_name,
-                release_date=release_date,
-                cover_url=cover_url,
-                musicbrainz_id=mbid
-            )
-            
-            self.session.add(album)
-            self.imported_count += 1
-            
-            score = self.get_popularity_score(release)
-            print(f"✅ {self.imported_count:4d}/{self.target_count} [score:{score:2d}] {artist_name} - {title}")
-            
-            # Commit every 50 albums
-            if self.imported_count % 50 == 0:
-                self.session.commit()
-                print(f"💾 Committed batch ({self.imported_count}/{self.target_count})")
-                print(f"📊 Progress: {(self.imported_count/self.target_count)*100:.1f}% | Rejected: {self.rejected_count}")
-            
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error importing {release.get('title', 'Unknown')}: {e}")
-            return False
+    def load_known_mbids(self):
+        """Load every mbid already in the database, so dedup needs no query per release"""
+        rows = self.session.query(Album.musicbrainz_id).filter(Album.musicbrainz_id.isnot(None)).yield_per(10000)
+        self.known_mbids = {mbid for (mbid,) in rows}
+        print(f"🗂️  {len(self.known_mbids)} albums already imported")
     
-    def get_cover_art_url(self, mbid):
-        """Get cover art from Cover Art Archive"""
+    def build_album_row(self, release):
+        """Album row for a release, with its cover looked up (cover stage)"""
+        mbid = release['id']
         try:
-            response = requests.get(
-                f"https://coverartarchive.org/release/{mbid}",
-                headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                images = data.get('images', [])
-                
-                for image in images:
-                    if image.get('front', False):
-                        return image['image']
-                
-                if images:
-                    return images[0]['image']
-                    
-        except Exception:
-            pass
-            
-        return "https://via.placeholder.com/500x500?text=No+Cover+Art"
+            cover_url = musicbrainz.fetch_cover_art_url(mbid, timeout=10, priority=musicbrainz.BACKGROUND)
+            cover_status = RESOLVED if cover_url else MISSING
+        except requests.RequestException:
+            # left to the background resolver, which retries with backoff
+            cover_url, cover_status = None, PENDING
+        
+        return {
+            'id': uuid.uuid4(),
+            'title': release['title'],
+            'artist': release['artist-credit'][0]['artist']['name'],
+            'release_date': self.parse_release_date(release.get('date', '')),
+            'cover_url': cover_url or musicbrainz.PLACEHOLDER_COVER_URL,
+            'musicbrainz_id': mbid,
+            'cover_status': cover_status,
+        }
     
-    def parse_release_date(self, date_str):
+    def write_batch(self, batch):
+        """
+        Insert a batch of (query, album row) with one multi-row insert and commit it together
+        with the checkpoints of the queries it completes and the run's counters
+        """
+        rows = [row for query, row in batch]
+        if rows:
+            self.session.execute(insert(Album).values(rows))
+        with self.lock:
+            for query, row in batch:
+                self.settle(query)
+            completed, self.completed = self.completed, []
+            imported, rejected = self.imported_count, self.rejected_count
+        now = datetime.now(timezone.utc)
+        if completed:
+            self.session.execute(insert(ImportCheckpoint).values([
+                {'run_id': self.run_id, 'query': query, 'completed_at': now} for query in completed
+            ]))
+        self.session.execute(update(ImportRun).where(ImportRun.id == self.run_id).values(
+            imported_count=imported, rejected_count=rejected
+        ))
+        self.session.commit()
+        # the resolver only updates committed rows, so pending covers are queued after the commit
+        for row in rows:
+            if row['cover_status'] == PENDING:
+                cover_resolver.enqueue(row['id'], row['musicbrainz_id'])
+    
+    @staticmethod
+    def parse_release_date(date_str):
         """Parse MusicBrainz date format"""
         if not date_str:
             return date(2000, 1, 1)
@@ -323,53 +357,329 @@ class PopularityFilteredImporter:
             
         return date(2000, 1, 1)
     
+    def settle(self, query):
+        """One release of a query is committed or rejected; call with self.lock held"""
+        self.outstanding[query] -= 1
+        if self.outstanding[query] == 0:
+            del self.outstanding[query]
+            self.completed.append(query)
+            self.finished_queries.add(query)
+    
+    def search_stage(self, queries, candidates, stats):
+        """Producer: runs searches (paced by the shared rate limiter) and queues candidate releases"""
+        while not self.done.is_set():
+            try:
+                i, query = next(queries)
+            except StopIteration:
+                return
+            print(f"🔍 [{i+1}/{self.total_searches}] {query[:60]}...")
+            started = time.monotonic()
+            releases = self.search_popular_releases(query, max_results=50)
+            if releases is None:
+                continue  # failed searches are not checkpointed, --resume runs them again
+            stats.record(len(releases), time.monotonic() - started)
+            newest = self.newest_release_date(release for release, score in releases)
+            with self.lock:
+                # the query is complete once every release is settled (or right away if there are none)
+                self.outstanding[query] = len(releases) + 1
+                self.settle(query)
+                family = self.query_families[query]
+                if newest and (family not in self.high_water or newest > self.high_water[family]):
+                    self.high_water[family] = newest
+            for release, score in releases:
+                if not self.put(candidates, (query, release, score)):
+                    return
+    
+    def cover_stage(self, candidates, rows, stats):
+        """Filters candidates and looks up their covers"""
+        while True:
+            item = candidates.get()
+            if item is STOP or self.done.is_set():
+                return
+            query, release, score = item
+            # skips the cover lookup for albums we already have, the writer makes the final call
+            if release.get('id') in self.known_mbids or not self.should_import_release(release, score):
+                with self.lock:
+                    self.rejected_count += 1
+                    self.settle(query)
+                continue
+            started = time.monotonic()
+            try:
+                row = self.build_album_row(release)
+            except Exception as e:
+                print(f"❌ Error importing {release.get('title', 'Unknown')}: {e}")
+                with self.lock:
+                    self.settle(query)
+                continue
+            stats.record(1, time.monotonic() - started)
+            if not self.put(rows, (query, row, score)):
+                return
+    
+    def writer_stage(self, rows, stats):
+        """Single DB writer: dedups, batches rows and commits them with multi-row inserts"""
+        try:
+            self.write_rows(rows, stats)
+        except Exception as e:
+            # stops the other stages, run_import re-raises it
+            self.error = e
+            self.done.set()
+    
+    def write_rows(self, rows, stats):
+        batch = []
+        while not self.done.is_set():
+            item = rows.get()
+            if item is STOP:
+                break
+            query, row, score = item
+            # the writer is the only thread adding to known_mbids, so this also catches
+            # duplicates that are still waiting in the current batch
+            if row['musicbrainz_id'] in self.known_mbids:
+                with self.lock:
+                    self.rejected_count += 1
+                    self.settle(query)
+                continue
+            self.known_mbids.add(row['musicbrainz_id'])
+            batch.append((query, row))
+            with self.lock:
+                self.imported_count += 1
+            print(f"✅ {self.imported_count:4d}/{self.target_count} [score:{score:2d}] {row['artist']} - {row['title']}")
+            
+            if self.imported_count >= self.target_count:
+                self.done.set()
+            if len(batch) >= self.batch_size or self.done.is_set():
+                started = time.monotonic()
+                self.write_batch(batch)
+                stats.record(len(batch), time.monotonic() - started)
+                print(f"💾 Committed batch ({self.imported_count}/{self.target_count})")
+                print(f"📊 Progress: {(self.imported_count/self.target_count)*100:.1f}% | Rejected: {self.rejected_count}")
+                batch = []
+        
+        # always runs, to commit the checkpoints of queries completed since the last batch
+        started = time.monotonic()
+        self.write_batch(batch)
+        stats.record(len(batch), time.monotonic() - started)
+    
+    def put(self, q, item):
+        """Blocking put that gives up once the target is reached; False if it gave up"""
+        while not self.done.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def report(self, stages, queues):
+        """Throughput of each stage and how full the queues between them are"""
+        parts = [stats.summary() for stats in stages]
+        parts += [f"{name} queue {q.qsize()}/{q.maxsize}" for name, q in queues]
+        print("⏱️  " + " | ".join(parts))
+    
+    def newest_release_date(self, releases):
+        """Latest release date among releases with a full, not future, date (None if there is none)"""
+        today = date.today()
+        dates = []
+        for release in releases:
+            release_date = release.get('date') or ''
+            try:
+                parsed = date.fromisoformat(release_date[:10]) if len(release_date) >= 10 else None
+            except ValueError:
+                parsed = None
+            if parsed and parsed <= today:
+                dates.append(parsed)
+        return max(dates, default=None)
+    
+    def sync_since(self):
+        """For incremental runs, the date each synced family searches from"""
+        if not self.incremental:
+            return {}
+        states = self.session.query(ImportSyncState).filter(ImportSyncState.importer == self.IMPORTER).all()
+        since = {}
+        for state in states:
+            if state.high_water_date:
+                since[state.family] = state.high_water_date - SYNC_OVERLAP
+                print(f"🔁 {state.family}: releases from {since[state.family]} (last synced {state.last_run_at:%Y-%m-%d %H:%M})")
+        return since
+    
+    def save_sync_state(self):
+        """Record high-water marks for families whose every query completed (not committed here)"""
+        families = {}
+        for query, family in self.query_families.items():
+            families.setdefault(family, []).append(query)
+        now = datetime.now(timezone.utc)
+        for family, queries in families.items():
+            if not all(query in self.finished_queries for query in queries):
+                continue  # a family cut short by the target keeps its old mark
+            statement = pg_insert(ImportSyncState).values(
+                importer=self.IMPORTER, family=family, high_water_date=self.high_water.get(family), last_run_at=now
+            )
+            self.session.execute(statement.on_conflict_do_update(
+                index_elements=['importer', 'family'],
+                set_={
+                    # never move a mark back, a quiet night has nothing newer to report
+                    'high_water_date': func.greatest(ImportSyncState.high_water_date, statement.excluded.high_water_date),
+                    'last_run_at': now,
+                }
+            ))
+    
+    def start_run(self):
+        """Start a new run, or with --resume continue the latest unfinished one; returns its completed queries"""
+        run = None
+        if self.resume:
+            run = self.session.query(ImportRun).filter(
+                ImportRun.importer == self.IMPORTER, ImportRun.finished_at.is_(None)
+            ).order_by(ImportRun.started_at.desc()).first()
+            if run is None:
+                print("ℹ️  No unfinished import to resume, starting a new one")
+        if run is None:
+            run = ImportRun(id=uuid.uuid4(), importer=self.IMPORTER, started_at=datetime.now(timezone.utc),
+                            mode="incremental" if self.incremental else "full")
+            self.session.add(run)
+            self.session.commit()
+            self.run_id = run.id
+            return set()
+        
+        self.run_id = run.id
+        self.incremental = run.mode == "incremental"
+        self.imported_count = run.imported_count
+        self.rejected_count = run.rejected_count
+        completed = {query for (query,) in self.session.query(ImportCheckpoint.query).filter(ImportCheckpoint.run_id == run.id)}
+        self.finished_queries.update(completed)
+        print(f"⏯️  Resuming {run.mode} import started {run.started_at:%Y-%m-%d %H:%M}: "
+              f"{self.imported_count} imported, {len(completed)} queries done")
+        return completed
+    
+    def finish_run(self):
+        self.save_sync_state()
+        self.session.execute(update(ImportRun).where(ImportRun.id == self.run_id).values(
+            finished_at=datetime.now(timezone.utc)
+        ))
+        self.session.commit()
+    
     def run_import(self):
         """Main import process"""
         try:
-            print(f"🚀 Starting popularity-filtered import (target: {self.target_count} albums)")
+            print(f"🚀 Starting popularity-filtered {'incremental ' if self.incremental else ''}import (target: {self.target_count} albums)")
+            completed = self.start_run()
+            self.load_known_mbids()
+            cover_resolver.start()
             
-            searches = self.get_popular_searches()
-            total_searches = len(searches)
-            print(f"📦 Generated {total_searches} search queries")
+            searches = self.get_popular_searches(self.sync_since())
+            self.query_families = {query: family for family, query in searches}
+            searches = [query for family, query in searches if query not in completed]
+            self.total_searches = len(searches)
+            print(f"📦 Generated {self.total_searches} search queries" + (f" ({len(completed)} already done)" if completed else ""))
+            if self.imported_count >= self.target_count:
+                self.done.set()
             
-            for i, query in enumerate(searches):
-                if self.imported_count >= self.target_count:
-                    break
-                
-                print(f"\n🔍 [{i+1}/{total_searches}] {query[:60]}...")
-                
-                releases = self.search_popular_releases(query, max_results=50)
-                
-                for release in releases:
-                    if self.imported_count >= self.target_count:
-                        break
-                        
-                    if self.should_import_release(release):
-                        self.import_release(release)
-                    else:
-                        self.rejected_count += 1
-                
-                # Rate limiting
-                time.sleep(1.5)
+            # search -> candidates -> covers -> rows -> writer, bounded so a fast stage can't run ahead
+            queries = iter(list(enumerate(searches)))
+            candidates = queue.Queue(maxsize=self.queue_size)
+            rows = queue.Queue(maxsize=self.queue_size)
+            search_stats = StageStats("search", "releases")
+            cover_stats = StageStats("covers", "albums")
+            writer_stats = StageStats("writer", "rows")
             
-            # Final commit
-            self.session.commit()
+            searchers = [
+                threading.Thread(target=self.search_stage, args=(_locked(queries, self.lock), candidates, search_stats))
+                for _ in range(self.search_workers)
+            ]
+            cover_workers = [
+                threading.Thread(target=self.cover_stage, args=(candidates, rows, cover_stats))
+                for _ in range(self.cover_workers)
+            ]
+            writer = threading.Thread(target=self.writer_stage, args=(rows, writer_stats))
+            for thread in searchers + cover_workers + [writer]:
+                thread.start()
+            
+            stages = [search_stats, cover_stats, writer_stats]
+            queues = [("candidates", candidates), ("rows", rows)]
+            # each stage is told to stop once everything upstream of it has finished
+            for threads, q, stop_count in ((searchers, candidates, self.cover_workers), (cover_workers, rows, 1)):
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(REPORT_EVERY)
+                        if thread.is_alive():
+                            self.report(stages, queues)
+                for _ in range(stop_count):
+                    self.put_stop(q)
+            writer.join()
+            if self.error:
+                raise self.error
+            self.finish_run()
             
             print(f"\n🎉 Import complete!")
             print(f"✅ Imported: {self.imported_count} albums")
             print(f"❌ Rejected: {self.rejected_count}")
-            print(f"📈 Accept rate: {(self.imported_count/(self.imported_count+self.rejected_count)*100):.1f}%")
+            print(f"📈 Accept rate: {(self.imported_count/max(1, self.imported_count+self.rejected_count)*100):.1f}%")
+            for stats in stages:
+                print(f"   {stats.summary()}")
             
             if self.imported_count >= 2000:
                 print("🎯 Database ready for production!")
             
+            print(f"🖼️  Waiting for {cover_resolver.pending_count()} cover lookups...")
+            cover_resolver.drain()
+            
         except Exception as e:
             print(f"❌ Import failed: {e}")
+            self.done.set()
             self.session.rollback()
             raise
         finally:
+            # covers still waiting on a retry stay pending and are picked up by the api
+            cover_resolver.stop()
             self.session.close()
+    
+    def put_stop(self, q):
+        # stop markers must get through even after the target is reached, so make room for them
+        while True:
+            try:
+                q.put(STOP, timeout=0.5)
+                return
+            except queue.Full:
+                if self.done.is_set():
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+
+class StageStats:
+    """Items and busy time of one pipeline stage, summed over its workers"""
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def record(self, items, seconds):
+        with self.lock:
+            self.items += items
+            self.busy += seconds
+    
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return f"{self.name}: {self.items} {self.unit} ({self.items / elapsed:.1f}/s, busy {self.busy:.0f}s)"
+
+
+def _locked(iterator, lock):
+    # lets several producer threads share one iterator
+    while True:
+        with lock:
+            item = next(iterator, STOP)
+        if item is STOP:
+            return
+        yield item
 
 if __name__ == "__main__":
-    importer = PopularityFilteredImporter()
+    parser = argparse.ArgumentParser(description="import popular albums from musicbrainz")
+    parser.add_argument("--resume", action="store_true", help="continue the last interrupted import from its checkpoint")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only search releases dated since each query family's last sync")
+    args = parser.parse_args()
+    
+    importer = PopularityFilteredImporter(resume=args.resume, incremental=args.incremental)
     importer.run_import()
\ No newline at end of file
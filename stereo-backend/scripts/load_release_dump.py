@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+loads albums from a local musicbrainz release json dump, no network needed
+the dump (mbdump/release: one release json per line, plain, compressed or still inside
+release.tar.xz) is read in one streaming pass; every chunk of releases is scored and
+filtered like import_albums.py and written with postgres COPY into a staging table, from
+which albums not already in the database are inserted; nothing grows with the dump, so
+memory stays flat however big it is
+covers come from the release's cover-art-archive flags: releases with front art point at
+the archive's front image url, the rest get the placeholder
+usage: python scripts/load_release_dump.py <dump> [--chunk 10000] [--limit N]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import tarfile
+import time
+import uuid
+
+from database.database import engine
+from database.models import Album
+from database import migrations
+from covers import MISSING, RESOLVED
+from musicbrainz import COVER_ART_URL, PLACEHOLDER_COVER_URL
+from import_albums import PopularityFilteredImporter
+
+COPY_COLUMNS = ("id", "title", "artist", "release_date", "cover_url", "musicbrainz_id", "cover_status")
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+def dump_lines(path):
+    # yields the dump's lines without ever holding more than one of them
+    if ".tar" in os.path.basename(path):
+        with tarfile.open(path, "r|*") as archive:  # streaming mode, members are read in order
+            for member in archive:
+                if member.name.endswith("mbdump/release"):
+                    for line in archive.extractfile(member):  # not seekable, so no TextIOWrapper
+                        yield line.decode("utf-8")
+                    return
+        raise ValueError(f"No mbdump/release in {path}")
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+    with opener(path, "rt", encoding="utf-8") as lines:
+        yield from lines
+
+def release_chunks(lines, size):
+    chunk = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        chunk.append(json.loads(line))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def album_row(release):
+    mbid = release["id"]
+    has_front = (release.get("cover-art-archive") or {}).get("front", False)
+    return (
+        str(uuid.uuid4()),
+        release["title"],
+        release["artist-credit"][0]["artist"]["name"],
+        PopularityFilteredImporter.parse_release_date(release.get("date", "")).isoformat(),
+        f"{COVER_ART_URL}/release/{mbid}/front-500" if has_front else PLACEHOLDER_COVER_URL,
+        mbid,
+        RESOLVED if has_front else MISSING,
+    )
+
+def create_staging_table(conn):
+    # emptied by every commit, so it only ever holds one chunk
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE album_load (
+                id UUID, title VARCHAR, artist VARCHAR, release_date DATE,
+                cover_url VARCHAR, musicbrainz_id VARCHAR, cover_status VARCHAR
+            ) ON COMMIT DELETE ROWS
+        """)
+    conn.commit()
+
+def copy_rows(conn, rows, limit=None):
+    # COPYs a chunk into staging and moves the albums we don't have yet, returns how many
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ", ".join(COPY_COLUMNS)
+    with conn.cursor() as cursor:
+        cursor.copy_expert(f"COPY album_load ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO {Album.__tablename__} ({columns}) "
+            f"SELECT {columns} FROM album_load s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {Album.__tablename__} a WHERE a.musicbrainz_id = s.musicbrainz_id) "
+            f"LIMIT %s",
+            (limit,)
+        )
+        inserted = cursor.rowcount
+    conn.commit()
+    return inserted
+
+def main():
+    parser = argparse.ArgumentParser(description="bulk load albums from a musicbrainz release json dump")
+    parser.add_argument("dump", help="mbdump/release file (plain, .gz, .bz2, .xz) or release.tar.xz")
+    parser.add_argument("--chunk", type=int, default=10000, help="releases scored and copied per round")
+    parser.add_argument("--limit", type=int, help="stop after loading this many albums")
+    args = parser.parse_args()
+
+    if migrations.current(engine) < migrations.head():
+        sys.exit("❌ database schema is out of date, run scripts/migrate.py upgrade first")
+    conn = engine.raw_connection()
+    try:
+        create_staging_table(conn)
+        started = time.monotonic()
+        read = loaded = 0
+        for chunk in release_chunks(dump_lines(args.dump), args.chunk):
+            read += len(chunk)
+            rows = [
+                album_row(release) for release in chunk
+                if release.get("id") and PopularityFilteredImporter.should_import_release(
+                    release, PopularityFilteredImporter.get_popularity_score(release))
+            ]
+            if rows:
+                loaded += copy_rows(conn, rows, None if args.limit is None else args.limit - loaded)
+            elapsed = time.monotonic() - started
+            print(f"📦 {read:,} releases read, {loaded:,} albums loaded ({read / elapsed:,.0f} releases/s)")
+            if args.limit is not None and loaded >= args.limit:
+                break
+
+        print(f"\n🎉 Loaded {loaded:,} of {read:,} releases in {time.monotonic() - started:.1f}s")
+        print("ℹ️  restart the api to add the new albums to search suggestions")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+applies or reverts versioned schema migrations from database/migrations
+usage:
+    python scripts/migrate.py upgrade [version]
+    python scripts/migrate.py downgrade <version>    (1 at the lowest, 0001 can't be reverted)
+    python scripts/migrate.py status
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import argparse
+from database.database import engine
+from database import migrations
+
+def main():
+    parser = argparse.ArgumentParser(description="manage database schema migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subparsers.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("version", type=int, nargs="?", help="stop after this version")
+    downgrade_parser = subparsers.add_parser("downgrade", help="revert migrations newer than a version")
+    downgrade_parser.add_argument("version", type=int, help="version to revert back to (1 at the lowest)")
+    subparsers.add_parser("status", help="list migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = migrations.upgrade(engine, args.version)
+        for migration in applied:
+            print(f"⬆️  applied {migration.version:04d}_{migration.name}")
+        if not applied:
+            print("✅ schema is up to date")
+    elif args.command == "downgrade":
+        try:
+            reverted = migrations.downgrade(engine, args.version)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        for migration in reverted:
+            print(f"⬇️  reverted {migration.version:04d}_{migration.name}")
+        if not reverted:
+            print("✅ nothing to revert")
+    else:
+        done = migrations.applied_versions(engine)
+        for migration in migrations.load_migrations():
+            state = "applied" if migration.version in done else "pending"
+            print(f"{migration.version:04d}_{migration.name}: {state}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+recomputes the album_stats aggregate table from the ratings table
+run after bulk-loading ratings outside the api or if the aggregates drift
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from database.database import get_db
+from database.album_stats import rebuild_album_stats
+
+def main():
+    db = next(get_db())
+    try:
+        album_count = rebuild_album_stats(db)
+        db.commit()
+        print(f"📊 rebuilt rating stats for {album_count} albums")
+    except Exception as e:
+        print(f"❌ error: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
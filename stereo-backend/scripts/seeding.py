@@ -5,14 +5,16 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 import uuid
-import requests
-import time
-from datetime import date
+from datetime import date, datetime, timezone
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
 
-from database.models import Album, TrendingAlbum, Rating, Review, Base
+from database.models import Album, TrendingAlbum, Rating, Review
+from database import migrations
+import musicbrainz
+from musicbrainz import BACKGROUND
+from musicbrainz.enrichment import enrich_releases
 
 load_dotenv()
 
@@ -23,71 +25,14 @@ if not DATABASE_URL:
 
 engine = create_engine(DATABASE_URL)
 
-# creates all tables in the database based on the models
-Base.metadata.create_all(bind=engine)
+# schema changes are left to scripts/migrate.py
+if migrations.current(engine) < migrations.head():
+    sys.exit("❌ database schema is out of date, run scripts/migrate.py upgrade first")
 
 # create session for database operations
 Session = sessionmaker(bind=engine)
 session = Session()
 
-def get_cover_art_url(mbid: str) -> str:
-    # gets cover art from cover art archive with fallback
-    try:
-        cover_response = requests.get(
-            f"https://coverartarchive.org/release/{mbid}",
-            headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-            timeout=5
-        )
-        if cover_response.status_code == 200:
-            cover_data = cover_response.json()
-            if cover_data.get('images'):
-                for image in cover_data['images']:
-                    if image.get('front', False):
-                        return image['image']
-                return cover_data['images'][0]['image']
-    except Exception:
-        pass
-    return "https://via.placeholder.com/500x500?text=No+Cover+Art"
-
-def get_album_annotation(mbid: str) -> str:
-    # gets album description from musicbrainz annotation
-    try:
-        annotation_response = requests.get(
-            f"https://musicbrainz.org/ws/2/release/{mbid}",
-            params={"inc": "annotation", "fmt": "json"},
-            headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-            timeout=5
-        )
-        if annotation_response.status_code == 200:
-            annotation_data = annotation_response.json()
-            return annotation_data.get('annotation', '')
-    except Exception:
-        pass
-    return ''
-
-def get_album_runtime(mbid: str) -> int | None:
-    # gets total album runtime in minutes from recordings
-    try:
-        recordings_response = requests.get(
-            f"https://musicbrainz.org/ws/2/release/{mbid}",
-            params={"inc": "recordings", "fmt": "json"},
-            headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-            timeout=10
-        )
-        if recordings_response.status_code == 200:
-            data = recordings_response.json()
-            total_ms = 0
-            if 'media' in data:
-                for medium in data['media']:
-                    if 'tracks' in medium:
-                        for track in medium['tracks']:
-                            if 'recording' in track and 'length' in track['recording']:
-                                total_ms += int(track['recording']['length'])
-            return total_ms // 60000  # convert ms to minutes
-    except Exception:
-        pass
-    return None
-
 def parse_release_date(date_str: str) -> date:
     # parses various date formats
     if not date_str or date_str == 'Unknown':
@@ -134,60 +79,48 @@ def seed_popular_albums():
         "Funeral Arcade Fire",
     ]
     
-    added_count = 0
+    # search stage: one (cached, rate limited) search per query, skipping albums we already have
+    releases = []
     for query in popular_albums:
         try:
-            # search musicbrainz for the album
-            response = requests.get(
-                "https://musicbrainz.org/ws/2/release",
-                params={"query": query, "fmt": "json", "limit": 1},
-                headers={"User-Agent": "WaxfeedApp/1.0 (kingpharoah19@gmail.com)"},
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                releases = data.get('releases', [])
-                
-                if releases:
-                    release = releases[0]
-                    
-                    # check if album already exists
-                    existing = session.query(Album).filter(
-                        Album.title.ilike(release['title']),
-                        Album.artist.ilike(release['artist-credit'][0]['artist']['name'] if release.get('artist-credit') else "Unknown")
-                    ).first()
-                    
-                    if not existing:
-                        artist_name = release['artist-credit'][0]['artist']['name'] if release.get('artist-credit') else "Unknown Artist"
-                        cover_url = get_cover_art_url(release['id'])
-                        release_date = parse_release_date(release.get('date', 'Unknown'))
-                        description = get_album_annotation(release['id'])
-                        runtime = get_album_runtime(release['id'])
-                        
-                        album = Album(
-                            id=uuid.uuid4(),
-                            title=release['title'],
-                            artist=artist_name,
-                            release_date=release_date,
-                            cover_url=cover_url,
-                            description=description,
-                            runtime_minutes=runtime,
-                            musicbrainz_id=release['id']
-                        )
-                        
-                        session.add(album)
-                        added_count += 1
-                        print(f"Added: {artist_name} - {release['title']}")
-                    else:
-                        print(f"Already exists: {existing.artist} - {existing.title}")
-            
-            # be nice to musicbrainz api
-            time.sleep(1)
-            
+            # the shared rate limiter paces the calls, leaving room for interactive searches
+            found = musicbrainz.search_releases(query, limit=1, priority=BACKGROUND)
         except Exception as e:
             print(f"Error processing '{query}': {e}")
             continue
+        if not found:
+            continue
+        release = found[0]
+        artist_name = release['artist-credit'][0]['artist']['name'] if release.get('artist-credit') else "Unknown Artist"
+        existing = session.query(Album).filter(
+            Album.title.ilike(release['title']),
+            Album.artist.ilike(artist_name)
+        ).first()
+        if existing:
+            print(f"Already exists: {existing.artist} - {existing.title}")
+        elif all(r['id'] != release['id'] for r, _ in releases):
+            releases.append((release, artist_name))
+
+    # enrichment stage: one release lookup (annotation + recordings) per album, covers in parallel
+    details = enrich_releases([release['id'] for release, _ in releases])
+
+    added_count = 0
+    for release, artist_name in releases:
+        album_details = details[release['id']]
+        album = Album(
+            id=uuid.uuid4(),
+            title=release['title'],
+            artist=artist_name,
+            release_date=parse_release_date(release.get('date', 'Unknown')),
+            cover_url=album_details.cover_url,
+            description=album_details.description,
+            runtime_minutes=album_details.runtime_minutes,
+            metadata_checked_at=datetime.now(timezone.utc) if album_details.release else None,
+            musicbrainz_id=release['id']
+        )
+        session.add(album)
+        added_count += 1
+        print(f"Added: {artist_name} - {release['title']}")
     
     session.commit()
     print(f"\nSeeding complete! Added {added_count} new albums.")